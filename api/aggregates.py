@@ -0,0 +1,156 @@
+"""
+Materialized daily aggregates for a WorkoutStore.
+
+Built once per dataset (and extended incrementally when newer sets are
+appended) so analyses touch one row per training day instead of every set:
+
+- a per-(exercise, day) table of max Epley 1RM, max weight, set count, rep sum
+  and volume, sorted by (exercise, day) with a per-exercise offsets index;
+- a per-day all-exercise volume table.
+
+Prefix sums over both tables answer date-range totals and averages with two
+binary searches, and sparse tables answer range maxima (best PR) in O(1).
+"""
+import numpy as np
+import pandas as pd
+
+from api.one_rm import estimate
+from api.store import DateLike, day_end, day_start, widen
+
+EXERCISE_DAILY_AGGS = {"max_1rm": "max", "max_weight": "max", "sets": "sum", "reps": "sum", "volume": "sum"}
+
+
+def _exercise_daily(frame: pd.DataFrame) -> pd.DataFrame:
+    """One row per (exercise, day) with max Epley 1RM, max weight, sets, reps and volume."""
+    weight = widen(frame["Weight"])
+    reps = widen(frame["Reps"])
+    sets = pd.DataFrame({
+        "exercise": frame["Exercise Name"].astype(str).to_numpy(),
+        "day": frame["Date"].dt.normalize().to_numpy(),
+        "max_1rm": estimate(weight, reps)["epley"],
+        "max_weight": weight,
+        "sets": 1,
+        "reps": reps,
+        "volume": weight * reps,
+    })
+    return _combine(sets)
+
+
+def _combine(rows: pd.DataFrame) -> pd.DataFrame:
+    return rows.groupby(["exercise", "day"], sort=True).agg(EXERCISE_DAILY_AGGS).reset_index()
+
+
+def _daily_volume(exercise_daily: pd.DataFrame) -> pd.DataFrame:
+    """All-exercise volume per day."""
+    return exercise_daily.groupby("day", sort=True)[["volume", "sets"]].sum().reset_index()
+
+
+def _prefix(values) -> np.ndarray:
+    """Prefix sums with a leading zero: sum of values[lo:hi] is p[hi] - p[lo]."""
+    return np.concatenate([[0.0], np.cumsum(np.nan_to_num(np.asarray(values, dtype=np.float64)))])
+
+
+def _sparse_max(values) -> list[np.ndarray]:
+    """levels[j][i] is max(values[i : i + 2**j])."""
+    levels = [np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)]
+    k = 1
+    while 2 * k <= len(levels[0]):
+        prev = levels[-1]
+        levels.append(np.maximum(prev[:-k], prev[k:]))
+        k *= 2
+    return levels
+
+
+def _range_max(levels: list[np.ndarray], lo: int, hi: int) -> float:
+    """max(values[lo:hi]), or 0.0 when none is set (e.g. cardio sets without a weight)."""
+    j = (hi - lo).bit_length() - 1
+    best = max(levels[j][lo], levels[j][hi - (1 << j)])
+    return float(best) if np.isfinite(best) else 0.0
+
+
+class DailyAggregates:
+    """Per-(exercise, day) and per-day tables with prefix sums and range-max indexes."""
+
+    def __init__(self, exercise_daily: pd.DataFrame, daily_volume: pd.DataFrame):
+        self.exercise_daily = exercise_daily
+        self.daily_volume = daily_volume
+
+        names = exercise_daily["exercise"].to_numpy()
+        self.exercises, starts = np.unique(names, return_index=True)
+        self.offsets = np.append(starts, len(names)).astype(np.int64)
+        self.days = exercise_daily["day"].to_numpy()
+        self._sets = _prefix(exercise_daily["sets"])
+        self._reps = _prefix(exercise_daily["reps"])
+        self._volume = _prefix(exercise_daily["volume"])
+        self._max_weight = _sparse_max(exercise_daily["max_weight"])
+
+        self.volume_days = daily_volume["day"].to_numpy()
+        self._day_volume = _prefix(daily_volume["volume"])
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "DailyAggregates":
+        exercise_daily = _exercise_daily(frame)
+        return cls(exercise_daily, _daily_volume(exercise_daily))
+
+    def extended(self, tail: pd.DataFrame) -> "DailyAggregates":
+        """Aggregates with newer sets folded in; only the tail's rows are aggregated from scratch."""
+        if tail.empty:
+            return self
+        exercise_daily = _combine(pd.concat([self.exercise_daily, _exercise_daily(tail)], ignore_index=True))
+        return DailyAggregates(exercise_daily, _daily_volume(exercise_daily))
+
+    def exercise_range(self, exercise: str, start: DateLike = None, end: DateLike = None) -> tuple[int, int]:
+        """Row slice [lo, hi) of the exercise-day table for an inclusive day range."""
+        i = int(np.searchsorted(self.exercises, exercise))
+        if i >= len(self.exercises) or self.exercises[i] != exercise:
+            return 0, 0
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        days = self.days[lo:hi]
+        a = lo if start is None else lo + int(np.searchsorted(days, day_start(start), side="left"))
+        b = hi if end is None else lo + int(np.searchsorted(days, day_end(end), side="left"))
+        return a, max(a, b)
+
+    def daily_max(self, exercise: str, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Per-day max Epley 1RM for one exercise."""
+        lo, hi = self.exercise_range(exercise, start, end)
+        return self.exercise_daily.iloc[lo:hi][["day", "max_1rm"]]
+
+    def exercise_stats(self, exercise: str, start: DateLike = None, end: DateLike = None) -> dict[str, float]:
+        """Best weight, per-set average volume and total volume for an exercise over a day range."""
+        lo, hi = self.exercise_range(exercise, start, end)
+        if hi <= lo:
+            return {"best_pr": 0.0, "average_volume": 0.0, "total_volume": 0.0, "sets": 0, "reps": 0.0}
+        sets = int(self._sets[hi] - self._sets[lo])
+        volume = float(self._volume[hi] - self._volume[lo])
+        return {
+            "best_pr": _range_max(self._max_weight, lo, hi),
+            "average_volume": volume / sets if sets else 0.0,
+            "total_volume": volume,
+            "sets": sets,
+            "reps": float(self._reps[hi] - self._reps[lo]),
+        }
+
+    def day_range(self, start: DateLike = None, end: DateLike = None) -> tuple[int, int]:
+        """Row slice [lo, hi) of the per-day volume table for an inclusive day range."""
+        lo = 0 if start is None else int(np.searchsorted(self.volume_days, day_start(start), side="left"))
+        hi = len(self.volume_days) if end is None else int(np.searchsorted(self.volume_days, day_end(end), side="left"))
+        return lo, max(lo, hi)
+
+    def volume(self, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """All-exercise volume per training day."""
+        lo, hi = self.day_range(start, end)
+        return self.daily_volume.iloc[lo:hi][["day", "volume"]]
+
+    def volume_stats(self, start: DateLike = None, end: DateLike = None) -> dict[str, float]:
+        """Total and per-training-day average volume over a day range."""
+        lo, hi = self.day_range(start, end)
+        total = float(self._day_volume[hi] - self._day_volume[lo])
+        return {"total_volume": total, "average_volume": total / (hi - lo) if hi > lo else 0.0, "days": hi - lo}
+
+    def prs(self) -> pd.Series:
+        """All-time max weight per exercise."""
+        if not len(self.exercises):
+            return pd.Series(dtype=np.float64)
+        best = np.maximum.reduceat(self._max_weight[0], self.offsets[:-1])
+        best[~np.isfinite(best)] = 0.0
+        return pd.Series(best, index=pd.Index(self.exercises, name="exercise"), name="max_weight")
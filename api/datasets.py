@@ -0,0 +1,179 @@
+"""
+Server-side dataset store.
+
+Uploads are parsed once and kept in memory under a content-hash dataset ID,
+so the analysis endpoints only need `dataset_id`, `exercise` and dates instead
+of the whole workout log on every request. Entries are evicted least recently
+used first, when they outlive the TTL, or when the store exceeds its memory cap.
+
+Long-lived consumers (Shiny sessions) `acquire` a dataset instead: it is built
+once per content hash and shared, and pinned while referenced. After the last
+reference is released, it stays cached like any other entry until the LRU, TTL
+or memory cap evicts it, so the next session to open it doesn't parse it again.
+Only unreferenced entries are evicted. A new dataset that would not fit next to
+the pinned ones is refused with DatasetStoreFull.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from api.store import WorkoutStore
+
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def dataset_id_for(fileobj) -> str:
+    """Content-hash ID of a binary file (identical uploads share an ID); reads in chunks and rewinds."""
+    digest = hashlib.sha256()
+    while chunk := fileobj.read(HASH_CHUNK_BYTES):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()[:16]
+
+
+class DatasetStoreFull(RuntimeError):
+    """Datasets in use already fill the store's memory or entry cap."""
+
+
+@dataclass
+class Dataset:
+    dataset_id: str
+    store: WorkoutStore
+    nbytes: int
+    last_used: float = field(default_factory=time.monotonic)
+    refs: int = 0
+    shared: Any = None  # engine handle to the store's shared-memory columns, if any
+
+
+class DatasetStore:
+    """Thread-safe LRU/TTL cache of parsed workout datasets with a memory cap."""
+
+    def __init__(self, max_entries: int = 32, ttl_seconds: float = 3600.0, max_bytes: int = 512 * 1024 * 1024,
+                 on_evict: Callable[[Dataset], None] | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries: OrderedDict[str, Dataset] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._building: dict[str, threading.Lock] = {}  # per dataset, so each is built once
+
+    def get(self, dataset_id: str) -> Dataset | None:
+        with self._lock:
+            self._expire()
+            ds = self._entries.get(dataset_id)
+            if ds is None:
+                return None
+            ds.last_used = time.monotonic()
+            self._entries.move_to_end(dataset_id)
+            return ds
+
+    def put(self, dataset_id: str, store: WorkoutStore, shared: Any = None) -> Dataset:
+        with self._lock:
+            return self._put(dataset_id, store, shared=shared)
+
+    def _put(self, dataset_id: str, store: WorkoutStore, refs: int = 0, shared: Any = None) -> Dataset:
+        ds = Dataset(dataset_id=dataset_id, store=store, nbytes=store.nbytes, refs=refs, shared=shared)
+        old = self._entries.pop(dataset_id, None)
+        if old is not None:
+            self._nbytes -= old.nbytes
+            ds.refs += old.refs
+            if old.shared is not ds.shared:
+                self._evicted(old)
+        self._entries[dataset_id] = ds
+        self._nbytes += ds.nbytes
+        self._expire()
+        self._evict()
+        return ds
+
+    def acquire(self, dataset_id: str, build: Callable[[], WorkoutStore]) -> Dataset:
+        """Take a reference to a shared dataset, building it (outside the store's lock) on first use.
+
+        Concurrent first uses wait for one build. Raises DatasetStoreFull if the
+        new dataset doesn't fit next to the referenced ones. Every successful
+        acquire must be paired with a release.
+        """
+        with self._lock:
+            if (ds := self._reference(dataset_id)) is not None:
+                return ds
+            building = self._building.setdefault(dataset_id, threading.Lock())
+        with building:
+            with self._lock:
+                if (ds := self._reference(dataset_id)) is not None:  # another consumer built it meanwhile
+                    return ds
+            try:
+                store = build()
+            finally:
+                with self._lock:
+                    self._building.pop(dataset_id, None)
+            with self._lock:
+                pinned = [ds for ds in self._entries.values() if ds.refs]
+                if pinned and (len(pinned) + 1 > self.max_entries
+                               or sum(ds.nbytes for ds in pinned) + store.nbytes > self.max_bytes):
+                    raise DatasetStoreFull("Too many datasets are open right now; try again shortly")
+                return self._put(dataset_id, store, refs=1)
+
+    def _reference(self, dataset_id: str) -> Dataset | None:
+        ds = self._entries.get(dataset_id)
+        if ds is not None:
+            ds.refs += 1
+            ds.last_used = time.monotonic()
+            self._entries.move_to_end(dataset_id)
+        return ds
+
+    def release(self, dataset_id: str) -> None:
+        """Drop a reference taken by acquire; unreferenced datasets are evicted like any other entry."""
+        with self._lock:
+            ds = self._entries.get(dataset_id)
+            if ds is None or ds.refs <= 0:
+                return
+            ds.refs -= 1
+            ds.last_used = time.monotonic()
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "referenced": sum(1 for ds in self._entries.values() if ds.refs),
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key in [k for k, ds in self._entries.items() if ds.last_used < cutoff and not ds.refs]:
+            ds = self._entries.pop(key)
+            self._nbytes -= ds.nbytes
+            self._evicted(ds)
+
+    def _evict(self) -> None:
+        # Referenced datasets are in use and stay; so does the most recent entry,
+        # even if it alone exceeds the cap.
+        while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+            victim = next((k for k, ds in list(self._entries.items())[:-1] if not ds.refs), None)
+            if victim is None:
+                return
+            ds = self._entries.pop(victim)
+            self._nbytes -= ds.nbytes
+            self._evicted(ds)
+
+    def _evicted(self, ds: Dataset) -> None:
+        if self.on_evict is not None:
+            self.on_evict(ds)
+
+
+def store_from_env(on_evict: Callable[[Dataset], None] | None = None) -> DatasetStore:
+    return DatasetStore(
+        max_entries=int(os.environ.get("LIFT_METRICS_DATASET_MAX_ENTRIES", 32)),
+        ttl_seconds=float(os.environ.get("LIFT_METRICS_DATASET_TTL", 3600)),
+        max_bytes=int(float(os.environ.get("LIFT_METRICS_DATASET_MAX_MB", 512)) * 1024 * 1024),
+        on_evict=on_evict,
+    )
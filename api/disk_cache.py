@@ -0,0 +1,251 @@
+"""
+Persistent on-disk cache of parsed datasets.
+
+Each dataset is stored under its content hash as uncompressed Arrow IPC files:
+the sorted, indexed store columns plus its precomputed daily aggregates and
+per-exercise PR records. Warm loads memory-map the files, so a known export
+comes back without re-parsing any CSV text and without copying its columns.
+
+The cache is opt-in: the servers use it only when LIFT_METRICS_CACHE_DIR
+names a directory (and pyarrow is installed). It holds at most
+LIFT_METRICS_CACHE_MAX_MB (default 1024); every save prunes the least recently
+used entries beyond that, so uploads can't fill the disk.
+
+    python -m api.disk_cache inspect
+    python -m api.disk_cache warm data/strong.csv
+    python -m api.disk_cache prune --max-mb 200 --older-than-days 30
+"""
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.aggregates import DailyAggregates
+from api.datasets import dataset_id_for
+from api.ingest import ExportMark, IngestResult, ingest_export
+from api.lifts import LiftIndex, configured_lift_groups
+from api.store import STORE_COLUMNS, WorkoutStore
+
+try:
+    import pyarrow as pa
+except ImportError:  # the cache is optional
+    pa = None
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+DEFAULT_DIR = Path(__file__).parent.parent / ".cache" / "datasets"  # for the CLI
+DEFAULT_MAX_MB = 1024
+# Small derived tables, written and read as whole frames
+TABLES = {
+    "exercise_daily": lambda store: store.aggregates.exercise_daily,
+    "daily_volume": lambda store: store.aggregates.daily_volume,
+    "lift_weight": lambda store: store.lifts.weight_records,
+    "lift_e1rm": lambda store: store.lifts.e1rm_records,
+    "lift_reps": lambda store: store.lifts.rep_records,
+}
+
+
+def _write(path: Path, table: "pa.Table") -> None:
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read(path: Path) -> "pa.Table":
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def _numpy(column: "pa.ChunkedArray") -> np.ndarray:
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return array.to_numpy(zero_copy_only=True)
+
+
+class DiskCache:
+    """Directory of parsed datasets keyed by source content hash."""
+
+    def __init__(self, directory: str | os.PathLike = DEFAULT_DIR, max_bytes: int | None = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def path(self, dataset_id: str) -> Path:
+        return self.directory / dataset_id
+
+    def _manifest(self, path: Path) -> dict | None:
+        try:
+            manifest = json.loads((path / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("format") == FORMAT_VERSION else None
+
+    def _valid(self, path: Path) -> bool:
+        return self._manifest(path) is not None
+
+    def load(self, dataset_id: str) -> WorkoutStore | None:
+        """Memory-map a cached dataset with its aggregates and PR records, or None on a miss."""
+        path = self.path(dataset_id)
+        manifest = self._manifest(path) if self.enabled else None
+        if manifest is None:
+            return None
+        try:
+            columns = _read(path / "store.arrow")
+            names = columns.column("Exercise Name")
+            names = names.chunk(0) if names.num_chunks == 1 else names.combine_chunks()
+            arrays = {"codes": names.indices.to_numpy(zero_copy_only=True), "by_date": _numpy(columns.column("by_date"))}
+            arrays.update({c: _numpy(columns.column(c)) for c in STORE_COLUMNS if c != "Exercise Name"})
+            store = WorkoutStore.from_columns(arrays, names.dictionary.to_pylist())
+            store.source = ExportMark(**manifest["source"]) if manifest.get("source") else None
+        except (OSError, ValueError, KeyError, TypeError, pa.ArrowException):
+            return None  # unreadable or partial entry: treat as a miss
+        self.load_derived(dataset_id, store)
+        os.utime(path / MANIFEST)  # last use, for pruning
+        return store
+
+    def load_derived(self, dataset_id: str, store: WorkoutStore) -> bool:
+        """Attach a cached dataset's aggregates and PR records to an equivalent store (e.g. one in shared memory)."""
+        path = self.path(dataset_id)
+        if not self.enabled or not self._valid(path):
+            return False
+        try:
+            tables = {name: _read(path / f"{name}.arrow").to_pandas() for name in TABLES}
+        except (OSError, pa.ArrowException):
+            return False
+        store.__dict__["aggregates"] = DailyAggregates(tables["exercise_daily"], tables["daily_volume"])
+        store.__dict__["lifts"] = LiftIndex(
+            store.exercises, tables["lift_weight"], tables["lift_e1rm"], tables["lift_reps"], configured_lift_groups()
+        )
+        return True
+
+    def save(self, dataset_id: str, store: WorkoutStore) -> Path | None:
+        """Write a dataset (computing its aggregates if needed), then prune to `max_bytes`; entries are replaced atomically."""
+        if not self.enabled:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = self.directory / f".{dataset_id}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir()
+        columns = store.columns()
+        codes = columns.pop("codes")
+        store_table = pa.table({
+            "Exercise Name": pa.DictionaryArray.from_arrays(codes, pa.array(store.exercises.tolist(), pa.string())),
+            **{name: pa.array(values) for name, values in columns.items()},
+        })
+        _write(staging / "store.arrow", store_table)
+        for name, table in TABLES.items():
+            _write(staging / f"{name}.arrow", pa.Table.from_pandas(table(store), preserve_index=False))
+        manifest = {"format": FORMAT_VERSION, "dataset_id": dataset_id, "rows": len(store), "created": time.time(),
+                    "source": dataclasses.asdict(store.source) if store.source is not None else None}
+        (staging / MANIFEST).write_text(json.dumps(manifest))
+        target = self.path(dataset_id)
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            staging.rename(target)
+        except OSError:  # another process saved it first
+            shutil.rmtree(staging, ignore_errors=True)
+        if self.max_bytes is not None:
+            self.prune(self.max_bytes)
+        return target
+
+    def load_or_ingest(self, dataset_id: str, source, base: WorkoutStore | None = None) -> IngestResult:
+        """A cached dataset, or the export parsed (appending to `base` if it extends it) and cached."""
+        store = self.load(dataset_id)
+        if store is not None:
+            return IngestResult(store, "cached", 0)
+        result = ingest_export(source, base)
+        self.save(dataset_id, result.store)
+        return result
+
+    def entries(self) -> list[dict]:
+        """Cached datasets with size and last use, most recently used first."""
+        if not self.directory.exists():
+            return []
+        out = []
+        for path in self.directory.iterdir():
+            manifest_path = path / MANIFEST
+            if path.name.startswith(".") or not manifest_path.exists():
+                continue  # a save in progress, or not an entry
+            try:  # another process may prune it meanwhile
+                manifest = json.loads(manifest_path.read_text())
+                out.append({
+                    "dataset_id": path.name,
+                    "rows": manifest.get("rows"),
+                    "bytes": sum(f.stat().st_size for f in path.iterdir()),
+                    "created": manifest.get("created"),
+                    "last_used": manifest_path.stat().st_mtime,
+                    "format": manifest.get("format"),
+                })
+            except (OSError, ValueError):
+                continue
+        return sorted(out, key=lambda e: -e["last_used"])
+
+    def remove(self, dataset_id: str) -> None:
+        shutil.rmtree(self.path(dataset_id), ignore_errors=True)
+
+    def prune(self, max_bytes: int | None = None, older_than: float | None = None) -> list[str]:
+        """Drop entries unused for `older_than` seconds, an old format, or least recently used beyond `max_bytes`."""
+        removed, total = [], 0
+        cutoff = None if older_than is None else time.time() - older_than
+        for entry in self.entries():
+            stale = entry["format"] != FORMAT_VERSION or (cutoff is not None and entry["last_used"] < cutoff)
+            if stale or (max_bytes is not None and total + entry["bytes"] > max_bytes):
+                self.remove(entry["dataset_id"])
+                removed.append(entry["dataset_id"])
+            else:
+                total += entry["bytes"]
+        return removed
+
+
+def cache_from_env() -> DiskCache | None:
+    directory = os.environ.get("LIFT_METRICS_CACHE_DIR", "")
+    if pa is None or directory.lower() in ("", "off", "0", "none"):
+        return None
+    max_mb = float(os.environ.get("LIFT_METRICS_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    return DiskCache(directory, int(max_mb * 1024 * 1024))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.disk_cache", description="Inspect, warm and prune the parsed-dataset cache.")
+    parser.add_argument("--dir", default=None, help="cache directory (default: LIFT_METRICS_CACHE_DIR or .cache/datasets)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("inspect", help="list cached datasets")
+    warm = commands.add_parser("warm", help="parse exports into the cache")
+    warm.add_argument("paths", nargs="+")
+    prune = commands.add_parser("prune", help="remove old or excess entries")
+    prune.add_argument("--max-mb", type=float, default=None)
+    prune.add_argument("--older-than-days", type=float, default=None)
+    prune.add_argument("--all", action="store_true", help="remove every entry")
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        parser.exit(1, "pyarrow is required for the dataset cache\n")
+    cache = DiskCache(args.dir) if args.dir else cache_from_env() or DiskCache()
+
+    if args.command == "inspect":
+        entries = cache.entries()
+        for e in entries:
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(e["last_used"]))
+            print(f"{e['dataset_id']}  {e['rows']:>8} rows  {e['bytes'] / 1024:>9.1f} KB  last used {last_used}")
+        print(f"{len(entries)} dataset(s), {sum(e['bytes'] for e in entries) / 1024 / 1024:.1f} MB in {cache.directory}")
+    elif args.command == "warm":
+        for path in args.paths:
+            with open(path, "rb") as f:
+                dataset_id = dataset_id_for(f)
+            started = time.perf_counter()
+            result = cache.load_or_ingest(dataset_id, path)
+            print(f"{path}: {dataset_id} {result.mode} ({len(result.store)} sets, {time.perf_counter() - started:.3f}s)")
+    elif args.command == "prune":
+        max_bytes = 0 if args.all else None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+        older_than = None if args.older_than_days is None else args.older_than_days * 86400
+        removed = cache.prune(max_bytes, older_than)
+        print(f"removed {len(removed)} dataset(s)")
+
+
+if __name__ == "__main__":
+    main()
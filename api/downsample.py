@@ -0,0 +1,92 @@
+"""
+Time-series downsampling for charts.
+
+Long histories have thousands of training days; a chart a few hundred pixels
+wide can't show them anyway. Largest-Triangle-Three-Buckets keeps the visual
+shape (peaks and troughs), min/max bucketing keeps each bucket's extremes, and
+both keep the series' record days (new running maxima, i.e. PRs) up to a
+quarter of the point budget, the most recent ones when there are more.
+Series already within the budget are returned unchanged.
+"""
+import numpy as np
+import pandas as pd
+
+from api.telemetry import span
+
+METHODS = ("lttb", "minmax")
+# Smallest point budget both methods can reduce a series to
+MIN_POINTS = 4
+
+
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[s]").astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (first and last always kept)."""
+    x, y = _as_float(x), np.nan_to_num(_as_float(y))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Indices of each bucket's min and max, with roughly n_out points in total."""
+    y = np.nan_to_num(_as_float(y))
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    keep = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            keep += [lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))]
+    return np.unique(keep)
+
+
+def record_indices(y) -> np.ndarray:
+    """Points that set a new running maximum (PR days), including the overall max."""
+    y = np.nan_to_num(_as_float(y), nan=-np.inf)
+    if not len(y):
+        return np.array([], dtype=np.int64)
+    previous_best = np.maximum.accumulate(np.r_[-np.inf, y[:-1]])
+    return np.flatnonzero(y > previous_best)
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int | None, method: str = "lttb") -> pd.DataFrame:
+    """Rows of `df` (sorted by `x`) reduced to about `max_points`, keeping PR days."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if not max_points or len(df) <= max_points:
+        return df
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    with span("downsample"):
+        records = record_indices(df[y].to_numpy())
+        # Records are a small budget share; beyond that keep the most recent ones.
+        records = records[-max(1, max_points // 4):]
+        budget = max(max_points - len(records), MIN_POINTS)
+        if method == "lttb":
+            picked = lttb_indices(df[x].to_numpy(), df[y].to_numpy(), budget)
+        else:
+            picked = minmax_indices(df[y].to_numpy(), budget)
+        return df.iloc[np.union1d(picked, records)]
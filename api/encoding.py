@@ -0,0 +1,182 @@
+"""
+Response encoding with content negotiation.
+
+Handlers build a payload whose tables are DataFrames; `respond` picks the
+representation from the request's Accept header (or a `format` query
+parameter) and compresses large bodies per Accept-Encoding:
+
+- application/json: row records, the original format (default);
+- application/vnd.liftmetrics.columnar+json: one array per column, so key
+  names are sent once per table instead of once per row;
+- application/vnd.apache.arrow.stream: Arrow IPC of the payload's main table,
+  with the remaining fields as JSON in the schema metadata (needs pyarrow).
+
+Bodies over COMPRESS_MIN_BYTES are brotli- (if installed) or gzip-compressed.
+"""
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from api.telemetry import span
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+try:
+    import brotli
+except ImportError:  # fall back to gzip
+    brotli = None
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.liftmetrics.columnar+json"
+ARROW = "application/vnd.apache.arrow.stream"
+FORMAT_ALIASES = {"json": JSON, "records": JSON, "columnar": COLUMNAR, "arrow": ARROW}
+COMPRESS_MIN_BYTES = 1024
+ARROW_METADATA_KEY = b"lift_metrics"
+
+
+def _parse_accept(header: str) -> list[tuple[str, float]]:
+    """Media ranges from an Accept header, highest quality first."""
+    ranges = []
+    for part in header.split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((media.lower(), q))
+    return sorted(ranges, key=lambda r: -r[1])
+
+
+def negotiate(request: Request, arrow_ok: bool = True) -> str:
+    """Pick the response media type; JSON unless the client asks for something else."""
+    supported = [JSON, COLUMNAR] + ([ARROW] if arrow_ok and pa is not None else [])
+    explicit = request.query_params.get("format")
+    if explicit:
+        media = FORMAT_ALIASES.get(explicit.lower())
+        if media not in supported:
+            raise HTTPException(status_code=406, detail=f"Unsupported format: {explicit}")
+        return media
+    ranges = _parse_accept(request.headers.get("accept", "") or "*/*")
+    for media, q in ranges:
+        if q <= 0:
+            continue
+        if media in ("*/*", "application/*"):
+            return JSON
+        if media in supported:
+            return media
+    raise HTTPException(status_code=406, detail=f"Acceptable formats: {', '.join(supported)}")
+
+
+def _is_day_column(values: pd.Series) -> bool:
+    return bool((values.dropna() == values.dropna().dt.normalize()).all())
+
+
+def _date_strings(values: pd.Series) -> list:
+    fmt = "%Y-%m-%d" if _is_day_column(values) else "%Y-%m-%d %H:%M:%S"
+    return values.dt.strftime(fmt).tolist()
+
+
+def _column(values: pd.Series) -> list:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _date_strings(values)
+    if pd.api.types.is_float_dtype(values):
+        return [None if np.isnan(v) else v for v in values.tolist()]
+    return values.tolist()
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    columns = {c: _column(df[c]) for c in df.columns}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def _columnar(df: pd.DataFrame) -> dict[str, list]:
+    return {c: _column(df[c]) for c in df.columns}
+
+
+def _encode(value, table):
+    if isinstance(value, pd.DataFrame):
+        return table(value)
+    if isinstance(value, dict):
+        return {k: _encode(v, table) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v, table) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _first_table(payload: dict) -> tuple[str, pd.DataFrame] | None:
+    for key, value in payload.items():
+        if isinstance(value, pd.DataFrame):
+            return key, value
+    return None
+
+
+def _arrow_table(df: pd.DataFrame) -> "pa.Table":
+    columns = {}
+    for c in df.columns:
+        values = df[c]
+        if pd.api.types.is_datetime64_any_dtype(values) and _is_day_column(values):
+            columns[c] = pa.array(values.to_numpy().astype("datetime64[D]"), type=pa.date32())
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            columns[c] = pa.array(values.to_numpy().astype("datetime64[ms]"), type=pa.timestamp("ms"))
+        else:
+            columns[c] = pa.array(values.to_numpy() if values.dtype != object else values.tolist())
+    return pa.table(columns)
+
+
+def _arrow_body(payload: dict, table: tuple[str, pd.DataFrame]) -> bytes:
+    name, df = table
+    rest = {k: v for k, v in payload.items() if k != name}
+    meta = {"table": name, "fields": _encode(rest, _columnar)}
+    arrow = _arrow_table(df)
+    arrow = arrow.replace_schema_metadata({ARROW_METADATA_KEY: json.dumps(meta).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow.schema) as writer:
+        writer.write_table(arrow)
+    return sink.getvalue().to_pybytes()
+
+
+def _compress(request: Request, body: bytes) -> tuple[bytes, str | None]:
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = {enc.split(";")[0].strip().lower() for enc in request.headers.get("accept-encoding", "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def respond(request: Request, payload: dict, table: tuple[str, pd.DataFrame] | None = None) -> Response:
+    """Encode `payload` in the negotiated format.
+
+    `table` names the DataFrame sent as the Arrow body; by default it is the
+    payload's first top-level DataFrame. Payloads without one are JSON-only.
+    """
+    table = table or _first_table(payload)
+    media = negotiate(request, arrow_ok=table is not None)
+    with span("serialise"):
+        if media == ARROW:
+            body = _arrow_body(payload, table)
+        else:
+            encoded = _encode(payload, _columnar if media == COLUMNAR else _records)
+            body = json.dumps(encoded, separators=(",", ":"), allow_nan=False).encode()
+    with span("compress"):
+        body, encoding = _compress(request, body)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media, headers=headers)
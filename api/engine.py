@@ -0,0 +1,321 @@
+"""
+Query execution engine.
+
+Parsing and analysis jobs run in a process pool sized to the machine's cores,
+so a large upload or heavy query doesn't hold the event loop or a single core.
+Parsed stores live in shared memory: a worker that ingests an export copies
+the store's columns into one shared block once, and every later job ships only
+the block's name and layout. Workers map the block (zero-copy) and keep a few
+mapped stores, with their aggregates, between jobs. With the on-disk dataset
+cache enabled (api.disk_cache), ingest of a known export maps the cached
+columns instead of parsing, and workers pick up the cached aggregates.
+
+Identical concurrent queries on the same dataset are coalesced into one job.
+Queue depth and per-query latency are kept for the metrics endpoints. Jobs
+run in a telemetry trace (api.telemetry) and their stage spans come back with
+the result, so a request's timings include the stages that ran in a worker.
+Jobs of a profiled request are profiled in the worker, and their stacks come
+back the same way.
+
+Workers are spawned when the app starts (`start`), not by the first request.
+With 0 workers (LIFT_METRICS_ENGINE_WORKERS=0, the default on machines with
+MIN_POOL_CORES cores or fewer, where a pool only adds spawn and IPC cost) jobs
+run inline in a thread, against the in-process store.
+
+Uploads reach a worker as the path of a temporary copy, never as bytes; the
+inline path reads the upload's file object directly.
+"""
+import asyncio
+import atexit
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from api.datasets import Dataset
+from api.disk_cache import cache_from_env
+from api.ingest import ExportMark, IngestResult, ingest_export
+from api.queries import QUERIES
+from api.store import WorkoutStore
+from api.telemetry import SamplingProfiler, current_profiler, metrics, profiled_call, record, span, trace
+
+ALIGN = 64
+WORKER_STORES = 8  # mapped stores each worker keeps between jobs
+LATENCY_WINDOW = 512  # recent jobs per query kept for percentiles
+MIN_POOL_CORES = 2  # at or below this many cores, jobs run inline by default
+SPOOL_CHUNK_BYTES = 1 << 20
+
+metrics.counter("lift_metrics_engine_jobs_total", "Engine jobs by job and outcome.")
+metrics.counter("lift_metrics_engine_coalesced_total", "Requests served by an identical in-flight job.")
+metrics.histogram("lift_metrics_engine_job_seconds", "Engine job latency, including queueing and IPC.")
+
+
+@dataclass(frozen=True)
+class SharedColumns:
+    """Picklable handle to a store's columns in one shared-memory block."""
+    block: str
+    rows: int
+    nbytes: int
+    exercises: tuple[str, ...]
+    layout: tuple[tuple[str, str, int], ...]  # (column, dtype, byte offset)
+    dataset_id: str | None = None  # disk cache key for precomputed aggregates
+    source: ExportMark | None = None  # end of the source export, for appending a newer one
+
+
+def publish(store: WorkoutStore, dataset_id: str | None = None) -> tuple[SharedMemory, SharedColumns]:
+    """Copy a store's columns into a new shared-memory block."""
+    arrays = store.columns()
+    layout, offset = [], 0
+    for name, values in arrays.items():
+        layout.append((name, values.dtype.str, offset))
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    for (name, dtype, start), values in zip(layout, arrays.values()):
+        np.ndarray(values.shape, dtype=dtype, buffer=shm.buf, offset=start)[:] = values
+    handle = SharedColumns(shm.name, len(store), offset, tuple(store.exercises.tolist()), tuple(layout), dataset_id, store.source)
+    return shm, handle
+
+
+def attach(handle: SharedColumns) -> tuple[SharedMemory, WorkoutStore]:
+    """Map a published block as a WorkoutStore without copying the columns."""
+    shm = SharedMemory(name=handle.block)
+    cols = {name: np.ndarray(handle.rows, dtype=dtype, buffer=shm.buf, offset=start) for name, dtype, start in handle.layout}
+    store = WorkoutStore.from_columns(cols, handle.exercises)
+    store.source = handle.source
+    return shm, store
+
+
+# Worker-process side -------------------------------------------------------
+
+_worker_stores: OrderedDict[str, tuple[SharedMemory, WorkoutStore]] = OrderedDict()
+_disk_cache = cache_from_env()
+
+
+def _worker_store(handle: SharedColumns) -> WorkoutStore:
+    if handle.block in _worker_stores:
+        _worker_stores.move_to_end(handle.block)
+        return _worker_stores[handle.block][1]
+    shm, store = attach(handle)
+    if _disk_cache is not None and handle.dataset_id:
+        _disk_cache.load_derived(handle.dataset_id, store)
+    _worker_stores[handle.block] = (shm, store)
+    while len(_worker_stores) > WORKER_STORES:
+        old, _ = _worker_stores.popitem(last=False)[1]
+        try:
+            old.close()
+        except BufferError:  # still viewed by a live frame; unmapped when collected
+            pass
+    return store
+
+
+def _query(store: WorkoutStore, query: str, params: dict):
+    return QUERIES[query](store, **params)
+
+
+def _run_query(handle: SharedColumns, query: str, params: dict):
+    return _query(_worker_store(handle), query, params)
+
+
+def _ready() -> None:
+    """Warm-up job: unpickling it imports this module (pandas, the queries) in the worker."""
+
+
+def _traced(fn, profile: bool, *args):
+    """Run a job in a worker; returns its result, the stage spans it recorded and, if `profile`, its sampled stacks."""
+    with trace() as spans:
+        if not profile:
+            return fn(*args), spans, None
+        with SamplingProfiler() as profiler:
+            result = fn(*args)
+    return result, spans, profiler.stacks
+
+
+def _load(dataset_id: str, source, base: WorkoutStore | None) -> IngestResult:
+    with span("ingest"):
+        if _disk_cache is None:
+            return ingest_export(source, base)
+        return _disk_cache.load_or_ingest(dataset_id, source, base)
+
+
+def _spool(fileobj) -> str:
+    """Copy an open upload to a named temporary file a worker can open; the caller removes it."""
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="lift-metrics-", suffix=".csv", delete=False) as f:
+        shutil.copyfileobj(fileobj, f, SPOOL_CHUNK_BYTES)
+    fileobj.seek(0)
+    return f.name
+
+
+def _run_ingest(dataset_id: str, source, base: SharedColumns | None) -> tuple[SharedColumns, dict]:
+    result = _load(dataset_id, source, _worker_store(base) if base else None)
+    # Workers share the server's resource tracker, so the block outlives this
+    # process; the server unlinks it when the dataset is evicted.
+    shm, handle = publish(result.store, dataset_id)
+    shm.close()
+    return handle, result.summary()
+
+
+# Server side ---------------------------------------------------------------
+
+class QueryEngine:
+    """Process-pool executor for ingest and analysis jobs, with coalescing and metrics."""
+
+    def __init__(self, workers: int | None = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._blocks: dict[str, SharedMemory] = {}
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._latency: dict[str, deque] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        atexit.register(self.shutdown)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def start(self) -> None:
+        """Spawn the workers now (they import in the background), so the first request doesn't pay for it."""
+        if self.workers > 0:
+            pool = self._executor()
+            for _ in range(self.workers):
+                pool.submit(_ready)
+
+    async def _coalesced(self, key: tuple, job):
+        """Await `job()` once for all concurrent callers with the same key."""
+        if key in self._inflight:
+            self.coalesced += 1
+            metrics.inc("lift_metrics_engine_coalesced_total")
+            return await asyncio.shield(self._inflight[key])
+        future = asyncio.ensure_future(job())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run(self, label: str, fn, *args):
+        self.submitted += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            if self.workers > 0:
+                profiler = current_profiler()
+                result, spans, stacks = await asyncio.wrap_future(self._executor().submit(_traced, fn, profiler is not None, *args))
+                record(spans)
+                if stacks:
+                    profiler.merge(stacks)
+            else:
+                result = await run_in_threadpool(profiled_call, fn, *args)
+            outcome = "ok"
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.completed += 1
+            elapsed = time.perf_counter() - started
+            self._latency.setdefault(label, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+            metrics.inc("lift_metrics_engine_jobs_total", job=label, outcome=outcome)
+            metrics.observe("lift_metrics_engine_job_seconds", elapsed, job=label)
+
+    async def _ingest(self, dataset_id: str, source, base: Dataset | None) -> tuple[WorkoutStore, SharedColumns | None, dict]:
+        if self.workers <= 0:
+            result = await self._run("ingest", _load, dataset_id, source, base.store if base else None)
+            return result.store, None, result.summary()
+        spooled = None
+        if not isinstance(source, (str, os.PathLike, bytes)):
+            spooled = source = await run_in_threadpool(_spool, source)
+        try:
+            handle, ingest_summary = await self._run("ingest", _run_ingest, dataset_id, source, base.shared if base else None)
+        finally:
+            if spooled is not None:
+                os.unlink(spooled)
+        shm, store = attach(handle)
+        with self._lock:
+            self._blocks[handle.block] = shm
+        return store, handle, ingest_summary
+
+    async def ingest(self, dataset_id: str, source, base: Dataset | None = None) -> tuple[WorkoutStore, SharedColumns | None, dict]:
+        """Parse an export (a path, bytes or binary file object), appending to `base` when it extends it, or load it from the disk cache."""
+        key = ("ingest", dataset_id, base.dataset_id if base else None)
+        return await self._coalesced(key, lambda: self._ingest(dataset_id, source, base))
+
+    async def query(self, ds: Dataset, query: str, **params):
+        """Run a query from api.queries against a stored dataset."""
+        key = (ds.dataset_id, query, json.dumps(params, sort_keys=True, default=str))
+        if ds.shared is None:
+            return await self._coalesced(key, lambda: self._run(query, _query, ds.store, query, params))
+        return await self._coalesced(key, lambda: self._run(query, _run_query, ds.shared, query, params))
+
+    def release(self, ds: Dataset) -> None:
+        """Unlink an evicted dataset's shared block."""
+        if ds.shared is None:
+            return
+        with self._lock:
+            shm = self._blocks.pop(ds.shared.block, None)
+        if shm is not None:
+            shm.unlink()
+            try:
+                shm.close()
+            except BufferError:  # the evicted store's views may still be alive
+                pass
+
+    def metrics(self) -> dict:
+        latency = {}
+        for label, samples in self._latency.items():
+            ordered = np.sort(np.fromiter(samples, dtype=np.float64))
+            latency[label] = {
+                "count": len(ordered),
+                "mean_ms": float(ordered.mean() * 1000),
+                "p50_ms": float(np.percentile(ordered, 50) * 1000),
+                "p95_ms": float(np.percentile(ordered, 95) * 1000),
+                "max_ms": float(ordered[-1] * 1000),
+            }
+        in_flight = self.submitted - self.completed
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - max(self.workers, 1)),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "shared_blocks": len(self._blocks),
+            "shared_bytes": sum(shm.size for shm in self._blocks.values()),
+            "latency": latency,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            blocks, self._blocks = list(self._blocks.values()), {}
+        for shm in blocks:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def engine_from_env() -> QueryEngine:
+    workers = os.environ.get("LIFT_METRICS_ENGINE_WORKERS")
+    if workers:
+        return QueryEngine(int(workers))
+    cores = os.cpu_count() or 1
+    return QueryEngine(cores if cores > MIN_POOL_CORES else 0)
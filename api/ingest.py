@@ -0,0 +1,232 @@
+"""
+Workout export ingestion.
+
+Exports are read in row chunks, keeping only the columns the analyses use with
+compact dtypes, so peak memory is a small multiple of the chunk size rather
+than of the file. The header is validated before any rows are parsed.
+
+Strong exports are cumulative: each one repeats the whole history plus the
+newest workouts. Every store remembers where its export ended (byte length,
+digest and row count). When a newer export starts with exactly those bytes,
+only the bytes after them are parsed, and their rows are merged into the base
+store. This happens only when every new row is past the base's high-water
+mark. Otherwise the whole export is parsed. The overlap is then checked key by
+key on (Date, Exercise Name, Set Order), and the duplicates and conflicts found
+are reported.
+"""
+import copy
+import csv
+import hashlib
+import io
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from api.store import COLUMNS, STORE_COLUMNS, WorkoutStore, parse_workout_df
+from api.telemetry import span
+
+KEY = ["Date", "Exercise Name", "Set Order"]
+STRONG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHUNK_ROWS = 50_000
+DIGEST_CHUNK_BYTES = 1 << 20
+# Raw dtypes while reading; parse_workout_df narrows them per chunk.
+READ_DTYPES = {
+    "Date": str,
+    "Exercise Name": "category",
+    "Set Order": "category",
+    "Weight": np.float32,
+    "Reps": np.float32,
+    "RPE": np.float32,
+}
+
+
+class ExportFormatError(ValueError):
+    """The file is not a readable workout export."""
+
+
+@dataclass(frozen=True)
+class ExportMark:
+    """End of the export a store was built from: its byte length, their digest and its data rows."""
+    nbytes: int
+    digest: str
+    rows: int
+
+
+@dataclass
+class IngestResult:
+    store: WorkoutStore
+    mode: str  # "full", "append" or "cached" (loaded from the disk cache)
+    added: int
+    duplicates: int = 0
+    conflicts: int = 0
+
+    def summary(self) -> dict:
+        return {"mode": self.mode, "added": self.added, "duplicates": self.duplicates, "conflicts": self.conflicts}
+
+
+def validate_header(fileobj) -> list[str]:
+    """Check the first line names every required column, then rewind."""
+    first = fileobj.readline()
+    fileobj.seek(0)
+    if isinstance(first, bytes):
+        first = first.decode("utf-8-sig", errors="replace")
+    header = next(csv.reader([first]), [])
+    missing = [c for c in COLUMNS if c not in header]
+    if missing:
+        raise ExportFormatError(f"Missing columns: {', '.join(missing)}")
+    return header
+
+
+def _parse_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    try:
+        chunk["Date"] = pd.to_datetime(chunk["Date"], format=STRONG_DATE_FORMAT)
+    except ValueError:
+        chunk["Date"] = pd.to_datetime(chunk["Date"])
+    return parse_workout_df(chunk)
+
+
+def iter_export(source, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield parsed chunks of an export; malformed rows abort at the chunk that holds them."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fileobj:
+            yield from iter_export(fileobj, chunk_rows)
+        return
+    validate_header(source)
+    reader = pd.read_csv(source, usecols=lambda c: c in STORE_COLUMNS, dtype=READ_DTYPES, chunksize=chunk_rows)
+    try:
+        for chunk in reader:
+            yield _parse_chunk(chunk)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise ExportFormatError(str(e)) from e
+
+
+def read_export(source, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Read an export chunk by chunk into one compact frame."""
+    chunks = list(iter_export(source, chunk_rows))
+    if not chunks:
+        return _parse_chunk(pd.DataFrame({c: pd.Series(dtype=READ_DTYPES[c]) for c in COLUMNS}))
+    names = union_categoricals([c["Exercise Name"] for c in chunks])
+    frame = pd.concat([c.drop(columns="Exercise Name") for c in chunks], ignore_index=True)
+    frame.insert(1, "Exercise Name", names)
+    return frame
+
+
+@contextmanager
+def _binary(source):
+    """`source` (bytes, a path or a binary file object) as a seekable binary file at its start."""
+    if isinstance(source, bytes):
+        yield io.BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fileobj:
+            yield fileobj
+    else:
+        source.seek(0)
+        yield source
+
+
+def _digest_prefix(fileobj, digest, nbytes: int | None = None) -> tuple[int, bytes]:
+    """Feed up to `nbytes` (default: all remaining) bytes to `digest`; returns (bytes read, last byte)."""
+    read, last = 0, b""
+    while nbytes is None or read < nbytes:
+        want = DIGEST_CHUNK_BYTES if nbytes is None else min(DIGEST_CHUNK_BYTES, nbytes - read)
+        chunk = fileobj.read(want)
+        if not chunk:
+            break
+        digest.update(chunk)
+        read += len(chunk)
+        last = chunk[-1:]
+    return read, last
+
+
+def export_mark(fileobj, rows: int) -> ExportMark:
+    """Mark of a whole export file with `rows` data rows; rewinds the file."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    nbytes, _ = _digest_prefix(fileobj, digest)
+    fileobj.seek(0)
+    return ExportMark(nbytes, digest.hexdigest(), rows)
+
+
+def _append_tail(fileobj, base: WorkoutStore) -> IngestResult | None:
+    """Append the rows after the base export's bytes, or None when the export doesn't extend it.
+
+    The export extends the base if it starts with the base export's exact
+    bytes, ending on a line break, and every new row is past the base's
+    high-water mark.
+    """
+    mark: ExportMark = base.source
+    digest = hashlib.sha256()
+    read, last = _digest_prefix(fileobj, digest, mark.nbytes)
+    if read != mark.nbytes or digest.hexdigest() != mark.digest:
+        return None
+    rest = fileobj.read()
+    if last not in (b"\n", b"\r") and rest[:1] not in (b"", b"\n", b"\r"):
+        return None  # the base's last row continues in this export
+    digest.update(rest)
+    fileobj.seek(0)
+    header = fileobj.readline()
+    tail = read_export(io.BytesIO(header.rstrip(b"\r\n") + b"\n" + rest))
+    if (tail["Date"] <= base.last_set).any():
+        return None
+    store = base.append(tail)
+    if store is base:
+        store = copy.copy(base)
+    store.source = ExportMark(mark.nbytes + len(rest), digest.hexdigest(), mark.rows + len(tail))
+    return IngestResult(store, "append", len(store) - len(base), duplicates=mark.rows)
+
+
+def _keyed(df: pd.DataFrame) -> pd.DataFrame:
+    """Make (Date, Exercise Name, Set Order) unique by numbering repeats (e.g. several "D" drop sets)."""
+    df = df.assign(**{"Exercise Name": df["Exercise Name"].astype(str)})
+    return df.assign(_repeat=df.groupby(KEY, sort=False).cumcount())
+
+
+def _classify_overlap(base: WorkoutStore, overlap: pd.DataFrame) -> tuple[int, int]:
+    """(duplicates, conflicts) for export rows at or before the base's high-water mark.
+
+    Rows whose key isn't in the base are neither: they are new sets, e.g. the
+    rest of a workout the base export stopped partway through.
+    """
+    if overlap.empty:
+        return 0, 0
+    existing = base.between(overlap["Date"].min(), None)
+    merged = _keyed(overlap).merge(
+        _keyed(existing), on=KEY + ["_repeat"], how="left", suffixes=("", "_base"), indicator=True
+    )
+    matched = merged["_merge"] == "both"
+    same = matched & np.isclose(merged["Weight"], merged["Weight_base"], equal_nan=True) & np.isclose(
+        merged["Reps"], merged["Reps_base"], equal_nan=True
+    )
+    return int(same.sum()), int((matched & ~same).sum())
+
+
+def ingest_export(source, base: WorkoutStore | None = None) -> IngestResult:
+    """Build a store from an export (bytes, a path or a binary file object), appending to `base` when it extends it.
+
+    Falls back to a full parse when there is no base or the export does not
+    start with the base's export unchanged; the overlap is then classified
+    against the base, for the report.
+    """
+    with _binary(source) as fileobj:
+        if base is not None and len(base) and base.source is not None:
+            with span("parse"):
+                appended = _append_tail(fileobj, base)
+            if appended is not None:
+                return appended
+            fileobj.seek(0)
+        with span("parse"):
+            raw = read_export(fileobj)
+            mark = export_mark(fileobj, len(raw))
+    store = WorkoutStore(raw)
+    store.source = mark
+    if base is not None and len(base):
+        duplicates, conflicts = _classify_overlap(base, raw.loc[(raw["Date"] <= base.last_set).to_numpy()])
+        return IngestResult(store, "full", len(store) - duplicates - conflicts, duplicates, conflicts)
+    return IngestResult(store, "full", len(store))
@@ -0,0 +1,184 @@
+"""
+Exercise-family index and per-group PR records.
+
+Lift groups ("bench", "squat", ...) are pattern rules over exercise names, so
+"Bench Press (Barbell)" and "Incline Bench Press (Dumbbell)" both count towards
+"bench". The index maps every distinct exercise to its groups once per dataset
+and keeps, per exercise and then per group, the record sets: heaviest weight,
+best Epley 1RM, and the most reps done at each weight, each with the date it
+was first achieved. Group lookups never touch the rows again.
+
+Groups default to bench/deadlift/squat and can be replaced with a JSON file
+named by LIFT_METRICS_LIFT_GROUPS:
+
+    {"bench": ["Bench Press"], "overhead": {"include": ["Overhead Press"], "exclude": ["Dumbbell"]}}
+
+Patterns are regular expressions searched anywhere in the name (so plain names
+match as substrings).
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import cache
+
+import pandas as pd
+
+from api.one_rm import estimate
+from api.store import widen
+
+
+@dataclass(frozen=True)
+class LiftGroup:
+    name: str
+    include: tuple[str, ...]
+    exclude: tuple[str, ...] = ()
+
+    def matches(self, exercise: str) -> bool:
+        return any(re.search(p, exercise) for p in self.include) and not any(re.search(p, exercise) for p in self.exclude)
+
+
+DEFAULT_LIFT_GROUPS = (
+    LiftGroup("bench", ("Bench Press",)),
+    LiftGroup("deadlift", ("Deadlift",)),
+    LiftGroup("squat", ("Squat",)),
+)
+
+
+def parse_lift_groups(config: dict) -> tuple[LiftGroup, ...]:
+    """Groups from {name: [patterns]} or {name: {"include": [...], "exclude": [...]}}."""
+    groups = []
+    for name, rule in config.items():
+        if isinstance(rule, dict):
+            include, exclude = rule.get("include", []), rule.get("exclude", [])
+        else:
+            include, exclude = rule, []
+        for pattern in [*include, *exclude]:
+            re.compile(pattern)  # fail on load, not on first lookup
+        groups.append(LiftGroup(name, tuple(include), tuple(exclude)))
+    return tuple(groups)
+
+
+@cache
+def configured_lift_groups() -> tuple[LiftGroup, ...]:
+    path = os.environ.get("LIFT_METRICS_LIFT_GROUPS")
+    if not path:
+        return DEFAULT_LIFT_GROUPS
+    with open(path) as f:
+        return parse_lift_groups(json.load(f))
+
+
+def _set_rows(frame: pd.DataFrame) -> pd.DataFrame:
+    """One candidate record per weighted set."""
+    weight = widen(frame["Weight"])
+    reps = widen(frame["Reps"])
+    rows = pd.DataFrame({
+        "exercise": frame["Exercise Name"].astype(str).to_numpy(),
+        "date": frame["Date"].to_numpy(),
+        "weight": weight,
+        "reps": reps,
+        "e1rm": estimate(weight, reps)["epley"],
+    })
+    return rows[rows["weight"].notna() & (rows["reps"] > 0)]
+
+
+def _best(rows: pd.DataFrame, value: str) -> pd.DataFrame:
+    """Per exercise, the set with the highest `value`, earliest first on ties."""
+    ordered = rows.sort_values(["exercise", value, "date"], ascending=[True, False, True], kind="stable")
+    return ordered.drop_duplicates("exercise").reset_index(drop=True)
+
+
+def _rep_records(rows: pd.DataFrame) -> pd.DataFrame:
+    """Per (exercise, weight), the set with the most reps, earliest first on ties."""
+    ordered = rows.sort_values(["exercise", "weight", "reps", "date"], ascending=[True, True, False, True], kind="stable")
+    return ordered.drop_duplicates(["exercise", "weight"]).reset_index(drop=True)
+
+
+def _top(rows: pd.DataFrame, value: str) -> dict | None:
+    """The set with the highest `value` (earliest on ties) as a JSON-ready record."""
+    if rows.empty:
+        return None
+    best = rows.sort_values([value, "date"], ascending=[False, True], kind="stable").iloc[0]
+    return {
+        "exercise": best["exercise"],
+        "date": str(pd.Timestamp(best["date"])),
+        "weight": float(best["weight"]),
+        "reps": float(best["reps"]),
+        "e1rm": float(best["e1rm"]),
+    }
+
+
+@dataclass
+class GroupRecords:
+    group: str
+    exercises: list[str]
+    max_weight: dict | None  # record set: exercise, date, weight, reps, e1rm
+    max_e1rm: dict | None
+    rep_records: pd.DataFrame  # most reps per weight, heaviest first
+
+    @classmethod
+    def from_records(cls, group: str, exercises: list[str], weight: pd.DataFrame, e1rm: pd.DataFrame,
+                     reps: pd.DataFrame) -> "GroupRecords":
+        per_weight = reps.sort_values(["weight", "reps", "date"], ascending=[True, False, True], kind="stable")
+        per_weight = per_weight.drop_duplicates("weight").iloc[::-1].reset_index(drop=True)
+        return cls(group, exercises, _top(weight, "weight"), _top(e1rm, "e1rm"), per_weight)
+
+    def summary(self) -> dict:
+        return {
+            "exercises": self.exercises,
+            "max_weight": self.max_weight,
+            "max_e1rm": self.max_e1rm,
+            "rep_records": self.rep_records[["weight", "reps", "date", "exercise"]],
+        }
+
+
+class LiftIndex:
+    """Exercise -> lift-group map with per-exercise and per-group PR records."""
+
+    def __init__(self, exercises, weight: pd.DataFrame, e1rm: pd.DataFrame, reps: pd.DataFrame,
+                 groups: tuple[LiftGroup, ...]):
+        # Per-exercise record sets; every group record is one of these rows.
+        self.weight_records, self.e1rm_records, self.rep_records = weight, e1rm, reps
+        self.groups = groups
+        self.exercises = sorted(exercises)
+        self.families: dict[str, list[str]] = {e: [g.name for g in groups if g.matches(e)] for e in self.exercises}
+        self.members: dict[str, list[str]] = {g.name: [e for e in self.exercises if g.name in self.families[e]] for g in groups}
+        self.records: dict[str, GroupRecords] = {}
+        for g in groups:
+            members = self.members[g.name]
+            self.records[g.name] = GroupRecords.from_records(
+                g.name, members,
+                weight[weight["exercise"].isin(members)],
+                e1rm[e1rm["exercise"].isin(members)],
+                reps[reps["exercise"].isin(members)],
+            )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, groups: tuple[LiftGroup, ...] | None = None) -> "LiftIndex":
+        rows = _set_rows(frame)
+        exercises = frame["Exercise Name"].astype(str).unique()
+        return cls(exercises, _best(rows, "weight"), _best(rows, "e1rm"), _rep_records(rows),
+                   configured_lift_groups() if groups is None else groups)
+
+    def extended(self, tail: pd.DataFrame) -> "LiftIndex":
+        """Index with newer sets folded in; only the tail's sets are scanned."""
+        if tail.empty:
+            return self
+        rows = _set_rows(tail)
+        exercises = set(self.exercises) | set(tail["Exercise Name"].astype(str).unique())
+        return LiftIndex(
+            exercises,
+            _best(pd.concat([self.weight_records, rows], ignore_index=True), "weight"),
+            _best(pd.concat([self.e1rm_records, rows], ignore_index=True), "e1rm"),
+            _rep_records(pd.concat([self.rep_records, rows], ignore_index=True)),
+            self.groups,
+        )
+
+    def get(self, names: list[str] | None = None) -> dict[str, GroupRecords]:
+        """Records for the named groups (all by default); KeyError names an unknown group."""
+        names = list(self.records) if names is None else names
+        return {name: self.records[name] for name in names}
+
+    def max_weights(self) -> dict[str, float]:
+        """All-time heaviest set per group, 0.0 for groups with no weighted sets."""
+        return {name: r.max_weight["weight"] if r.max_weight else 0.0 for name, r in self.records.items()}
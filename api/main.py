@@ -3,15 +3,38 @@ Lift Metrics - FastAPI backend.
 Same logic as the original Shiny app; returns JSON for a React/Next.js frontend.
 """
 import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Literal
 
-import numpy as np
-import pandas as pd
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, Query, Request, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
 
-app = FastAPI(title="Lift Metrics API")
+from api.datasets import Dataset, dataset_id_for, store_from_env
+from api.encoding import respond
+from api.downsample import MIN_POINTS
+from api.engine import engine_from_env
+from api.one_rm import FORMULAS
+from api.queries import UnknownLiftGroups
+from api.set_table import DEFAULT_LIMIT, MAX_LIMIT, InvalidCursor
+from api.team import TeamRegistry, TeamStore, UnknownAthlete
+from api.telemetry import SamplingProfiler, metrics, profiled_call, server_timing, trace
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    engine.start()
+    yield
+    engine.shutdown()
+
+
+app = FastAPI(title="Lift Metrics API", lifespan=lifespan)
 
 _origins = [
     "http://localhost:3000",
@@ -29,27 +52,65 @@ app.add_middleware(
 )
 
 # Default dataset (same as Shiny app)
-DEFAULT_CSV = Path(__file__).parent.parent / "data" / "strong.csv"
-
-
-def parse_workout_df(df: pd.DataFrame) -> pd.DataFrame:
-    """Normalize columns and ensure correct dtypes."""
-    cols = ["Date", "Exercise Name", "Set Order", "Weight", "Reps"]
-    out = df[[c for c in cols if c in df.columns]].copy()
-    out["Date"] = pd.to_datetime(out["Date"])
-    return out
-
-
-def get_prs(df: pd.DataFrame) -> dict[str, float]:
-    """All-time PRs for Bench, Deadlift, Squat (max weight)."""
-    bench = df[df["Exercise Name"].str.contains("Bench Press", na=False)]["Weight"].max()
-    deadlift = df[df["Exercise Name"].str.contains("Deadlift", na=False)]["Weight"].max()
-    squat = df[df["Exercise Name"].str.contains("Squat", na=False)]["Weight"].max()
-    return {
-        "bench": float(bench) if pd.notna(bench) else 0.0,
-        "deadlift": float(deadlift) if pd.notna(deadlift) else 0.0,
-        "squat": float(squat) if pd.notna(squat) else 0.0,
-    }
+DEFAULT_CSV = Path(os.environ.get("LIFT_METRICS_DEFAULT_CSV", Path(__file__).parent.parent / "data" / "strong.csv"))
+
+# Parsing and analyses run in a process pool against shared-memory stores
+engine = engine_from_env()
+
+# Parsed uploads, keyed by content hash, so analyses only need a dataset_id
+datasets = store_from_env(on_evict=engine.release)
+
+# Team mode: many athletes' daily aggregates per team, for cross-athlete queries
+teams = TeamRegistry()
+
+# Opt-in sampling profiler: with LIFT_METRICS_PROFILING=1, requests sent with
+# ?profile=1 (or an X-Profile: 1 header) are sampled and their collapsed stacks kept
+PROFILING = os.environ.get("LIFT_METRICS_PROFILING", "").lower() in ("1", "true", "yes", "on")
+PROFILES_KEPT = 16
+profiles: OrderedDict[str, str] = OrderedDict()
+# Requests being handled; a profile samples the event loop only while its request is alone on it
+in_flight = 0
+
+metrics.counter("lift_metrics_http_requests_total", "HTTP requests by method, route and status.")
+metrics.histogram("lift_metrics_http_request_seconds", "HTTP request latency by route.")
+
+
+@app.middleware("http")
+async def timing(request: Request, call_next):
+    """Per-stage timings as a Server-Timing header, request metrics, and the profiler when asked for."""
+    global in_flight
+    profile = PROFILING and "1" in (request.query_params.get("profile"), request.headers.get("x-profile"))
+    started = time.perf_counter()
+    in_flight += 1
+    try:
+        with trace() as spans:
+            if profile:
+                with SamplingProfiler(exclusive=lambda: in_flight == 1) as profiler:
+                    response = await call_next(request)
+            else:
+                response = await call_next(request)
+    finally:
+        in_flight -= 1
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    route = route.path if route is not None else "unmatched"
+    metrics.inc("lift_metrics_http_requests_total", method=request.method, route=route, status=str(response.status_code))
+    metrics.observe("lift_metrics_http_request_seconds", elapsed, route=route)
+    response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    if request.headers.get("origin") in _origins:
+        response.headers["Timing-Allow-Origin"] = request.headers["origin"]
+    if profile:
+        profile_id = uuid.uuid4().hex[:16]
+        profiles[profile_id] = profiler.collapsed()
+        while len(profiles) > PROFILES_KEPT:
+            profiles.popitem(last=False)
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+async def in_thread(fn, *args):
+    """Run blocking work in the thread pool, sampled when the request is being profiled."""
+    return await run_in_threadpool(profiled_call, fn, *args)
 
 
 @app.get("/api/health")
@@ -57,127 +118,317 @@ def health():
     return {"status": "ok"}
 
 
+async def dataset_summary(ds: Dataset) -> dict:
+    """Upload response: everything the UI needs up front, without the raw rows."""
+    return {"dataset_id": ds.dataset_id, **await engine.query(ds, "summary")}
+
+
+async def load_dataset(source, dataset_id: str, base: Dataset | None = None) -> tuple[Dataset, dict]:
+    """Parse an export (a path or an upload's file) once; identical contents reuse the stored dataset.
+
+    With a `base` dataset, an export that extends it is appended instead of
+    being parsed from scratch.
+    """
+    ds = datasets.get(dataset_id)
+    if ds is not None:
+        return ds, {"mode": "cached", "added": 0, "duplicates": 0, "conflicts": 0}
+    try:
+        store, shared, ingest = await engine.ingest(dataset_id, source, base)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    # Coalesced uploads of the same file share one result; the first stores it.
+    ds = datasets.get(dataset_id)
+    if ds is None or ds.shared is not shared:
+        ds = datasets.put(dataset_id, store, shared)
+    return ds, ingest
+
+
+def require_dataset(dataset_id: str) -> Dataset:
+    ds = datasets.get(dataset_id)
+    if ds is None:
+        raise HTTPException(status_code=404, detail="Dataset not found or expired; upload it again")
+    return ds
+
+
 @app.get("/api/default-data")
-def get_default_data():
-    """Return parsed default CSV so the app works without an upload."""
+async def get_default_data(request: Request):
+    """Register the default CSV so the app works without an upload."""
     if not DEFAULT_CSV.exists():
         raise HTTPException(status_code=404, detail="Default data file not found")
-    df = parse_workout_df(pd.read_csv(DEFAULT_CSV))
-    exercises = sorted(df["Exercise Name"].dropna().unique().tolist())
-    date_min = df["Date"].min().isoformat() if len(df) else None
-    date_max = df["Date"].max().isoformat() if len(df) else None
-    rows = df.astype({"Date": str}).to_dict(orient="records")
-    return {
-        "exercises": exercises,
-        "data": rows,
-        "date_range": {"min": date_min, "max": date_max},
-        "prs": get_prs(df),
-    }
+    with DEFAULT_CSV.open("rb") as f:
+        dataset_id = await in_thread(dataset_id_for, f)
+    ds, _ = await load_dataset(str(DEFAULT_CSV), dataset_id)
+    return respond(request, await dataset_summary(ds))
 
 
 @app.post("/api/upload")
-async def upload(file: UploadFile = File(...)):
-    """Parse uploaded workout CSV (e.g. from Strong app export) and return exercises, data, date range, and PRs."""
+async def upload(request: Request, file: UploadFile = File(...), base_dataset_id: str | None = Form(None)):
+    """Parse uploaded workout CSV (e.g. from Strong app export) into a server-side dataset.
+
+    Pass the previous upload's `base_dataset_id` to append only the new workouts
+    of a newer cumulative export.
+    """
     if not file.filename or not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="CSV file required")
-    contents = await file.read()
-    try:
-        df = pd.read_csv(pd.io.common.BytesIO(contents))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
-    df = parse_workout_df(df)
-    exercises = sorted(df["Exercise Name"].dropna().unique().tolist())
-    date_min = df["Date"].min().isoformat() if len(df) else None
-    date_max = df["Date"].max().isoformat() if len(df) else None
-    rows = df.astype({"Date": str}).to_dict(orient="records")
-    return {
-        "exercises": exercises,
-        "data": rows,
-        "date_range": {"min": date_min, "max": date_max},
-        "prs": get_prs(df),
-    }
+    base = datasets.get(base_dataset_id) if base_dataset_id else None
+    # Starlette spools large uploads to disk; hash from there in chunks.
+    dataset_id = await in_thread(dataset_id_for, file.file)
+    ds, ingest = await load_dataset(file.file, dataset_id, base)
+    return respond(request, {**await dataset_summary(ds), "ingest": ingest})
 
 
 class OneRMRequest(BaseModel):
-    data: list[dict]
+    dataset_id: str
     exercise: str
     start_date: str
     end_date: str
+    # Downsample the chart series to about this many points (the latest PR days fill up to a quarter)
+    max_points: int | None = Field(None, ge=MIN_POINTS)
+    downsample: Literal["lttb", "minmax"] = "lttb"
 
 
 @app.post("/api/analysis/1rm")
-def analysis_1rm(req: OneRMRequest):
-    """1 Rep Max (Epley) over time + stats + table for selected exercise and date range."""
-    df = pd.DataFrame(req.data)
-    if df.empty:
-        return {"daily_max": [], "stats": {"best_pr": 0, "average_volume": 0, "total_volume": 0}, "table_data": []}
-    df["Date"] = pd.to_datetime(df["Date"])
-    df = df[df["Exercise Name"] == req.exercise].copy()
-    if df.empty:
-        return {"daily_max": [], "stats": {"best_pr": 0, "average_volume": 0, "total_volume": 0}, "table_data": []}
-    df["Date_dt"] = df["Date"].dt.date
-    start = pd.to_datetime(req.start_date).date()
-    end = pd.to_datetime(req.end_date).date()
-    mask = (df["Date_dt"] >= start) & (df["Date_dt"] <= end)
-    df = df.loc[mask]
-    if df.empty:
-        return {"daily_max": [], "stats": {"best_pr": 0, "average_volume": 0, "total_volume": 0}, "table_data": []}
-
-    # Epley 1RM
-    df["1_Rep_Max"] = (df["Weight"] * df["Reps"] / 30) + df["Weight"]
-    daily_max = df.groupby("Date")["1_Rep_Max"].max().reset_index()
-    daily_max["date"] = daily_max["Date"].dt.strftime("%Y-%m-%d")
-    daily_max = daily_max.rename(columns={"1_Rep_Max": "one_rep_max"})
-
-    stats = {
-        "best_pr": float(df["Weight"].max()),
-        "average_volume": float((df["Weight"] * df["Reps"]).mean()),
-        "total_volume": float((df["Weight"] * df["Reps"]).sum()),
-    }
+async def analysis_1rm(req: OneRMRequest, request: Request):
+    """1 Rep Max (Epley) over time + stats for selected exercise and date range."""
+    ds = require_dataset(req.dataset_id)
+    payload = await engine.query(
+        ds, "1rm", exercise=req.exercise, start_date=req.start_date, end_date=req.end_date,
+        max_points=req.max_points, method=req.downsample,
+    )
+    return respond(request, payload)
 
-    table = df[["Date", "Set Order", "Weight", "Reps"]].copy()
-    table["Date"] = table["Date"].astype(str)
-    table_data = table.to_dict(orient="records")
 
-    return {
-        "daily_max": daily_max[["date", "one_rep_max"]].to_dict(orient="records"),
-        "stats": stats,
-        "table_data": table_data,
-    }
+@app.get("/api/sets")
+async def exercise_sets(
+    request: Request,
+    dataset_id: str,
+    exercise: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    sort: Literal["date", "weight", "reps", "e1rm", "volume"] = "date",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+    set_type: Literal["working", "warmup", "drop", "failure"] | None = None,
+    min_weight: float | None = None,
+    max_weight: float | None = None,
+    min_reps: float | None = None,
+    max_reps: float | None = None,
+):
+    """One page of an exercise's sets, sorted and filtered server-side.
+
+    Pass the previous page's `next_cursor` as `cursor` (with the same sort and
+    filters) for the next page; `total` counts every matching set.
+    """
+    ds = require_dataset(dataset_id)
+    try:
+        page = await engine.query(
+            ds, "sets", exercise=exercise, start_date=start_date, end_date=end_date, sort=sort,
+            descending=order == "desc", limit=limit, cursor=cursor, set_type=set_type,
+            min_weight=min_weight, max_weight=max_weight, min_reps=min_reps, max_reps=max_reps,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond(request, {"dataset_id": dataset_id, "exercise": exercise, **page})
+
+
+class OneRMBatchRequest(BaseModel):
+    dataset_id: str
+    exercises: list[str] = Field(min_length=1)
+    formulas: list[str] = Field(default=["epley"], min_length=1)
+    start_date: str | None = None
+    end_date: str | None = None
+    rpe_adjusted: bool = False
+    max_points: int | None = Field(None, ge=MIN_POINTS)
+    downsample: Literal["lttb", "minmax"] = "lttb"
+
+
+@app.post("/api/analysis/1rm/batch")
+async def analysis_1rm_batch(req: OneRMBatchRequest, request: Request):
+    """Daily max 1RM series for many exercises and formulas in one grouped computation."""
+    unknown = [f for f in req.formulas if f not in FORMULAS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown formula(s): {', '.join(unknown)}; expected one of {', '.join(FORMULAS)}")
+    ds = require_dataset(req.dataset_id)
+    formulas = list(dict.fromkeys(req.formulas))
+    series, daily = await engine.query(
+        ds, "1rm_batch", exercises=list(dict.fromkeys(req.exercises)), formulas=formulas,
+        start_date=req.start_date, end_date=req.end_date, rpe_adjusted=req.rpe_adjusted,
+        max_points=req.max_points, method=req.downsample,
+    )
+    # Arrow clients get the flat (exercise, date, formulas...) table instead of the per-exercise split.
+    return respond(request, {"formulas": formulas, "series": series}, table=("series", daily))
 
 
 class VolumeRequest(BaseModel):
-    data: list[dict]
+    dataset_id: str
     start_date: str
     end_date: str
+    max_points: int | None = Field(None, ge=MIN_POINTS)
+    downsample: Literal["lttb", "minmax"] = "lttb"
 
 
 @app.post("/api/analysis/volume")
-def analysis_volume(req: VolumeRequest):
+async def analysis_volume(req: VolumeRequest, request: Request):
     """Daily volume vs average over date range."""
-    df = pd.DataFrame(req.data)
-    if df.empty:
-        return {"daily_volume": []}
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Date_dt"] = df["Date"].dt.date
-    start = pd.to_datetime(req.start_date).date()
-    end = pd.to_datetime(req.end_date).date()
-    mask = (df["Date_dt"] >= start) & (df["Date_dt"] <= end)
-    df = df.loc[mask]
-    if df.empty:
-        return {"daily_volume": []}
-    df["Volume"] = df["Weight"] * df["Reps"]
-    daily_volume = df.groupby("Date")["Volume"].sum().reset_index()
-    daily_volume["Average_Volume"] = daily_volume["Volume"].mean()
-    daily_volume["Color"] = np.where(
-        daily_volume["Volume"] < daily_volume["Average_Volume"],
-        "Below Average",
-        "Above Average",
+    ds = require_dataset(req.dataset_id)
+    daily_volume = await engine.query(
+        ds, "volume", start_date=req.start_date, end_date=req.end_date, max_points=req.max_points, method=req.downsample,
+    )
+    return respond(request, {"daily_volume": daily_volume})
+
+
+class TrainingLoadRequest(BaseModel):
+    dataset_id: str
+    start_date: str | None = None
+    end_date: str | None = None
+    # Adds the exercise's rolling 1RM trend
+    exercise: str | None = None
+    max_points: int | None = Field(None, ge=MIN_POINTS)
+    downsample: Literal["lttb", "minmax"] = "lttb"
+
+
+@app.post("/api/analysis/load")
+async def analysis_load(req: TrainingLoadRequest, request: Request):
+    """Acute:chronic workload ratio, fitness/fatigue/form and weekly tonnage over a date range."""
+    ds = require_dataset(req.dataset_id)
+    payload = await engine.query(
+        ds, "load", start_date=req.start_date, end_date=req.end_date, exercise=req.exercise,
+        max_points=req.max_points, method=req.downsample,
     )
-    daily_volume["date"] = daily_volume["Date"].dt.strftime("%Y-%m-%d")
-    out = daily_volume[["date", "Volume", "Average_Volume", "Color"]].copy()
-    out = out.rename(columns={"Volume": "volume", "Average_Volume": "average_volume", "Color": "color"})
-    return {"daily_volume": out.to_dict(orient="records")}
+    return respond(request, payload)
+
+
+@app.get("/api/prs")
+async def lift_prs(request: Request, dataset_id: str, group: list[str] | None = Query(None)):
+    """PR records per lift group (all configured groups unless `group` is given)."""
+    ds = require_dataset(dataset_id)
+    try:
+        groups = await engine.query(ds, "prs", groups=group)
+    except UnknownLiftGroups as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return respond(request, {"dataset_id": dataset_id, "groups": groups})
+
+
+def require_team(team_id: str) -> TeamStore:
+    team = teams.get(team_id)
+    if team is None:
+        raise HTTPException(status_code=404, detail="Team not found; register an athlete first")
+    return team
+
+
+@app.post("/api/teams/{team_id}/athletes")
+async def register_athlete(
+    request: Request,
+    team_id: str,
+    athlete_id: str = Form(...),
+    file: UploadFile | None = File(None),
+    dataset_id: str | None = Form(None),
+    bodyweight: float | None = Form(None, gt=0),
+):
+    """Add (or replace) an athlete's export in a team, from an upload or an already stored `dataset_id`."""
+    if file is not None:
+        if not file.filename or not file.filename.lower().endswith(".csv"):
+            raise HTTPException(status_code=400, detail="CSV file required")
+        dataset_id = await in_thread(dataset_id_for, file.file)
+        ds, _ = await load_dataset(file.file, dataset_id)
+    elif dataset_id:
+        ds = require_dataset(dataset_id)
+    else:
+        raise HTTPException(status_code=400, detail="Upload a file or pass dataset_id")
+    exercise_daily = await engine.query(ds, "exercise_daily")
+    team = await in_thread(teams.register, team_id, athlete_id, ds.dataset_id, exercise_daily, bodyweight)
+    return respond(request, {"team_id": team_id, "athlete_id": athlete_id, "dataset_id": ds.dataset_id, **team.summary()})
+
+
+@app.get("/api/teams/{team_id}")
+def team_summary(team_id: str):
+    """Registered athletes with their set counts, and the team's lift groups."""
+    return {"team_id": team_id, **require_team(team_id).summary()}
+
+
+@app.delete("/api/teams/{team_id}/athletes/{athlete_id}")
+def remove_athlete(team_id: str, athlete_id: str):
+    try:
+        team = teams.remove(team_id, athlete_id)
+    except UnknownAthlete as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"team_id": team_id, **team.summary()}
+
+
+@app.get("/api/teams/{team_id}/leaderboard")
+async def team_leaderboard(
+    request: Request,
+    team_id: str,
+    group: str,
+    metric: Literal["e1rm", "weight"] = "e1rm",
+    relative: bool = False,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    limit: int | None = Query(None, ge=1),
+):
+    """Athletes ranked by their best e1RM or weight in a lift group over a date window (or per bodyweight)."""
+    team = require_team(team_id)
+    try:
+        board = await in_thread(team.leaderboard, group, metric, start_date, end_date, relative, limit)
+    except UnknownLiftGroups as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return respond(request, {"team_id": team_id, "group": group, "metric": metric, "relative": relative, "leaderboard": board})
+
+
+@app.get("/api/teams/{team_id}/relative-strength")
+async def team_relative_strength(
+    request: Request,
+    team_id: str,
+    group: list[str] | None = Query(None),
+    metric: Literal["e1rm", "weight"] = "e1rm",
+    start_date: str | None = None,
+    end_date: str | None = None,
+):
+    """Per-athlete best per lift group and total, divided by bodyweight."""
+    team = require_team(team_id)
+    try:
+        table = await in_thread(team.relative_strength, group, metric, start_date, end_date)
+    except UnknownLiftGroups as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return respond(request, {"team_id": team_id, "metric": metric, "athletes": table})
+
+
+@app.get("/api/teams/{team_id}/volume")
+async def team_volume(request: Request, team_id: str, start_date: str | None = None, end_date: str | None = None):
+    """Per-athlete volume over a date window with percentile ranks and the team distribution."""
+    team = require_team(team_id)
+    result = await in_thread(team.volume_percentiles, start_date, end_date)
+    return respond(request, {"team_id": team_id, **result})
+
+
+@app.get("/api/engine/metrics")
+def engine_metrics():
+    """Worker pool queue depth, per-query latency and stored-dataset memory."""
+    return {**engine.metrics(), "datasets": datasets.stats()}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage, request and engine metrics in the Prometheus text format."""
+    pool, stored = engine.metrics(), datasets.stats()
+    gauges = {
+        "lift_metrics_engine_workers": ("Engine worker processes.", pool["workers"]),
+        "lift_metrics_engine_in_flight": ("Engine jobs submitted and not finished.", pool["in_flight"]),
+        "lift_metrics_engine_queue_depth": ("Engine jobs waiting for a worker.", pool["queue_depth"]),
+        "lift_metrics_engine_shared_bytes": ("Bytes of datasets published to shared memory.", pool["shared_bytes"]),
+        "lift_metrics_datasets": ("Stored datasets.", stored["entries"]),
+        "lift_metrics_dataset_bytes": ("Memory held by stored datasets.", stored["bytes"]),
+    }
+    return PlainTextResponse(metrics.exposition(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """A profiled request's collapsed stacks, for flamegraph.pl, speedscope or inferno."""
+    if profile_id not in profiles:
+        raise HTTPException(status_code=404, detail="Profile not found; profiles are kept for the last few profiled requests")
+    return profiles[profile_id]
 
 
 if __name__ == "__main__":
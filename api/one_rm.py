@@ -0,0 +1,94 @@
+"""
+Vectorized one-rep-max estimation.
+
+Every formula runs over whole NumPy columns at once, and the batch path reduces
+many exercises to daily maxima in a single grouped pass over the store's
+(exercise, date)-sorted rows.
+"""
+import numpy as np
+import pandas as pd
+
+from api.store import DateLike, WorkoutStore, widen
+
+
+def _epley(w: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return w * (1 + r / 30)
+
+
+def _brzycki(w: np.ndarray, r: np.ndarray) -> np.ndarray:
+    denom = 37 - r
+    return np.where(denom > 0, w * 36 / np.where(denom > 0, denom, 1), np.nan)
+
+
+def _lombardi(w: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return w * np.power(np.clip(r, 0, None), 0.10)
+
+
+def _lander(w: np.ndarray, r: np.ndarray) -> np.ndarray:
+    denom = 101.3 - 2.67123 * r
+    return np.where(denom > 0, 100 * w / np.where(denom > 0, denom, 1), np.nan)
+
+
+def _oconner(w: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return w * (1 + 0.025 * r)
+
+
+FORMULAS = {
+    "epley": _epley,
+    "brzycki": _brzycki,
+    "lombardi": _lombardi,
+    "lander": _lander,
+    "oconner": _oconner,
+}
+
+
+def effective_reps(reps: np.ndarray, rpe: np.ndarray | None) -> np.ndarray:
+    """Reps plus reps in reserve (10 - RPE) where an RPE was logged."""
+    if rpe is None:
+        return reps
+    reserve = np.clip(10 - np.asarray(rpe, dtype=np.float64), 0, None)
+    return reps + np.nan_to_num(reserve)
+
+
+def estimate(weight, reps, formulas=("epley",), rpe=None) -> dict[str, np.ndarray]:
+    """1RM estimates per formula for every set; `rpe` adds reps in reserve first."""
+    unknown = [f for f in formulas if f not in FORMULAS]
+    if unknown:
+        raise ValueError(f"Unknown 1RM formula(s): {', '.join(unknown)}")
+    w = np.asarray(weight, dtype=np.float64)
+    r = effective_reps(np.asarray(reps, dtype=np.float64), rpe)
+    return {name: FORMULAS[name](w, r) for name in formulas}
+
+
+def daily_max_batch(
+    store: WorkoutStore,
+    exercises: list[str],
+    formulas=("epley",),
+    start: DateLike = None,
+    end: DateLike = None,
+    rpe_adjusted: bool = False,
+) -> pd.DataFrame:
+    """Daily max 1RM per (exercise, day) for many exercises and formulas in one pass.
+
+    Columns are exercise, day and one per formula, sorted by (exercise, day).
+    """
+    bounds = [store.exercise_range(name, start, end) for name in exercises]
+    rows = np.concatenate([np.arange(lo, hi) for lo, hi in bounds] or [np.array([], dtype=np.int64)])
+    if not len(rows):
+        return pd.DataFrame(columns=["exercise", "day", *formulas])
+    frame = store.frame
+    rpe = frame["RPE"].to_numpy()[rows] if rpe_adjusted else None
+    estimates = estimate(widen(frame["Weight"].to_numpy()[rows]), widen(frame["Reps"].to_numpy()[rows]), formulas, rpe)
+
+    # Rows are grouped by exercise then sorted by date, so each (exercise, day)
+    # group is a contiguous run that reduceat can collapse.
+    group = np.repeat(np.arange(len(bounds)), [hi - lo for lo, hi in bounds])
+    days = store.dates[rows].astype("datetime64[D]")
+    starts = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) | (days[1:] != days[:-1])])
+    out = {
+        "exercise": np.asarray(exercises, dtype=object)[group[starts]],
+        "day": days[starts].astype("datetime64[ns]"),
+    }
+    for name, values in estimates.items():
+        out[name] = np.fmax.reduceat(values, starts)
+    return pd.DataFrame(out)
@@ -0,0 +1,123 @@
+"""
+Analysis queries over a WorkoutStore.
+
+Each query is a plain function of a store and JSON-like parameters returning
+a picklable payload, so the engine can run it in a worker process (against a
+shared-memory view of the store) or inline. HTTP concerns stay in main.py.
+"""
+import numpy as np
+import pandas as pd
+
+from api.downsample import downsample
+from api.one_rm import daily_max_batch
+from api.set_table import set_page
+from api.store import WorkoutStore
+from api.telemetry import span
+
+
+class UnknownLiftGroups(LookupError):
+    """Requested lift groups are not configured."""
+
+
+def summary(store: WorkoutStore) -> dict:
+    """Everything the UI needs up front, without the raw rows."""
+    date_min, date_max = store.date_bounds()
+    return {
+        "exercises": store.exercises.tolist(),
+        "exercise_totals": store.exercise_totals(),
+        "date_range": {
+            "min": date_min.isoformat() if date_min is not None else None,
+            "max": date_max.isoformat() if date_max is not None else None,
+        },
+        "prs": store.lifts.max_weights(),
+    }
+
+
+def one_rm(store: WorkoutStore, exercise: str, start_date: str, end_date: str,
+           max_points: int | None = None, method: str = "lttb") -> dict:
+    """Daily max Epley 1RM series and stats for an exercise and date range (its sets are paged by `sets`)."""
+    agg = store.aggregates
+    with span("filter"):
+        daily_max = agg.daily_max(exercise, start_date, end_date)
+        daily_max = pd.DataFrame({"date": daily_max["day"].to_numpy(), "one_rep_max": daily_max["max_1rm"].to_numpy()})
+        stats = agg.exercise_stats(exercise, start_date, end_date)
+    daily_max = downsample(daily_max, "date", "one_rep_max", max_points, method)
+    return {
+        "daily_max": daily_max,
+        "stats": {k: stats[k] for k in ("best_pr", "average_volume", "total_volume")},
+    }
+
+
+def one_rm_batch(store: WorkoutStore, exercises: list[str], formulas: list[str], start_date: str | None = None,
+                 end_date: str | None = None, rpe_adjusted: bool = False, max_points: int | None = None,
+                 method: str = "lttb") -> tuple[dict[str, pd.DataFrame], pd.DataFrame]:
+    """Per-exercise daily max series, plus the flat (exercise, date, formulas...) table."""
+    with span("aggregate"):
+        daily = daily_max_batch(store, exercises, formulas, start_date, end_date, rpe_adjusted)
+    daily = daily.rename(columns={"day": "date"})
+    series = {name: daily.iloc[0:0][["date", *formulas]] for name in exercises}
+    for name, group in daily.groupby("exercise", sort=False):
+        # Points are picked on the first formula so every formula shares the same dates.
+        series[name] = downsample(group[["date", *formulas]], "date", formulas[0], max_points, method)
+    return series, daily
+
+
+def volume(store: WorkoutStore, start_date: str, end_date: str, max_points: int | None = None,
+           method: str = "lttb") -> pd.DataFrame:
+    """All-exercise daily volume against the range's average."""
+    agg = store.aggregates
+    with span("filter"):
+        daily_volume = agg.volume(start_date, end_date)
+        average = agg.volume_stats(start_date, end_date)["average_volume"]
+        out = pd.DataFrame({
+            "date": daily_volume["day"].to_numpy(),
+            "volume": daily_volume["volume"].to_numpy(),
+            "average_volume": average,
+            "color": np.where(daily_volume["volume"] < average, "Below Average", "Above Average"),
+        })
+    return downsample(out, "date", "volume", max_points, method)
+
+
+def lift_records(store: WorkoutStore, groups: list[str] | None = None) -> dict[str, dict]:
+    """PR records per lift group (all configured groups by default)."""
+    index = store.lifts
+    unknown = [name for name in groups or [] if name not in index.records]
+    if unknown:
+        raise UnknownLiftGroups(f"Unknown lift group(s): {', '.join(unknown)}")
+    return {name: r.summary() for name, r in index.get(groups).items()}
+
+
+def training_load(store: WorkoutStore, start_date: str | None = None, end_date: str | None = None,
+                  exercise: str | None = None, max_points: int | None = None, method: str = "lttb") -> dict:
+    """Rolling load (ACWR, fitness/fatigue), weekly tonnage and, for an exercise, its rolling 1RM trend."""
+    load = store.training_load
+    with span("filter"):
+        daily = load.series(start_date, end_date)
+        weekly = load.weekly_tonnage(start_date, end_date)
+        latest = load.latest(end_date)
+        trend = None if exercise is None else load.trend(exercise, start_date, end_date).drop(columns="exercise")
+    out = {
+        "daily": downsample(daily, "day", "volume", max_points, method).rename(columns={"day": "date"}),
+        "weekly": weekly,
+        "latest": latest,
+    }
+    if trend is not None:
+        out["trend"] = downsample(trend, "day", "max_1rm", max_points, method).rename(columns={"day": "date"})
+    return out
+
+
+def exercise_daily(store: WorkoutStore) -> pd.DataFrame:
+    """Per-(exercise, day) aggregates, as registered in a team store."""
+    return store.aggregates.exercise_daily
+
+
+QUERIES = {
+    "summary": summary,
+    "1rm": one_rm,
+    "1rm_batch": one_rm_batch,
+    "volume": volume,
+    "prs": lift_records,
+    "load": training_load,
+    "sets": set_page,
+    "exercise_daily": exercise_daily,
+}
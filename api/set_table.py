@@ -0,0 +1,117 @@
+"""
+Keyset-paginated set table for one exercise.
+
+Store rows are sorted by (exercise, date) with each workout's sets in set
+order, so an exercise's sets over a date range are one contiguous slice and a
+row's position is its place in the (exercise, date, set order) order. Pages
+are read from that slice after vectorized filters; other sort keys (weight,
+reps, Epley 1RM, volume) order the filtered rows by value with the position as
+tie-breaker. A cursor holds the last row's (key, position), so the next page
+starts after it by binary search, however deep it is, and pages stay
+consistent while other requests read the same dataset.
+"""
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+
+from api.one_rm import estimate
+from api.store import SET_ORDER_CODES, DateLike, WorkoutStore, set_order_labels, widen
+from api.telemetry import span
+
+SORT_KEYS = ("date", "weight", "reps", "e1rm", "volume")
+SET_TYPES = {"working": None, "warmup": SET_ORDER_CODES["W"], "drop": SET_ORDER_CODES["D"], "failure": SET_ORDER_CODES["F"]}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for a different sort."""
+
+
+def encode_cursor(sort: str, descending: bool, key: float, position: int) -> str:
+    raw = json.dumps([sort, descending, float(key), int(position)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, key, position = json.loads(raw)
+        key, position = float(key), int(position)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if (cursor_sort, cursor_descending) != (sort, descending):
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    return key, position
+
+
+def _sort_values(sort: str, weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    if sort == "weight":
+        return weight
+    if sort == "reps":
+        return reps
+    if sort == "e1rm":
+        return estimate(weight, reps)["epley"]
+    return weight * reps
+
+
+def set_page(store: WorkoutStore, exercise: str, start_date: DateLike = None, end_date: DateLike = None,
+             sort: str = "date", descending: bool = False, limit: int = DEFAULT_LIMIT, cursor: str | None = None,
+             set_type: str | None = None, min_weight: float | None = None, max_weight: float | None = None,
+             min_reps: float | None = None, max_reps: float | None = None) -> dict:
+    """One page of an exercise's sets, with the filtered total and the cursor of the next page (None on the last)."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}; expected one of {', '.join(SORT_KEYS)}")
+    if set_type is not None and set_type not in SET_TYPES:
+        raise ValueError(f"Unknown set type: {set_type}; expected one of {', '.join(SET_TYPES)}")
+    after = None if cursor is None else decode_cursor(cursor, sort, descending)
+    lo, hi = store.exercise_range(exercise, start_date, end_date)
+    frame = store.frame
+    with span("filter"):
+        weight = widen(frame["Weight"].to_numpy()[lo:hi])
+        reps = widen(frame["Reps"].to_numpy()[lo:hi])
+        set_order = frame["Set Order"].to_numpy()[lo:hi]
+        keep = np.ones(hi - lo, dtype=bool)
+        if set_type == "working":
+            keep &= set_order > 0
+        elif set_type is not None:
+            keep &= set_order == SET_TYPES[set_type]
+        for values, bound, above in ((weight, min_weight, True), (weight, max_weight, False),
+                                     (reps, min_reps, True), (reps, max_reps, False)):
+            if bound is not None:
+                keep &= values >= bound if above else values <= bound
+        positions = lo + np.flatnonzero(keep)
+        total = len(positions)
+
+        # Page order is ascending (key, tie) with both negated for a descending sort;
+        # in date order the key is the position itself, already sorted.
+        tie = -positions if descending else positions
+        if sort == "date":
+            order = np.arange(total)[::-1] if descending else np.arange(total)
+            key = tie[order].astype(np.float64)
+        else:
+            values = np.nan_to_num(_sort_values(sort, weight[keep], reps[keep]), nan=-np.inf)
+            values = -values if descending else values
+            order = np.lexsort((tie, values))
+            key = values[order]
+        ties = tie[order]
+
+        start = 0
+        if after is not None:
+            after_key, after_tie = after
+            start = int(np.searchsorted(key, after_key, side="left"))
+            same = int(np.searchsorted(key, after_key, side="right"))
+            start += int(np.searchsorted(ties[start:same], after_tie, side="right"))
+        stop = min(start + limit, total)
+        page = positions[order[start:stop]]
+        rows = frame.take(page)
+        table = pd.DataFrame({
+            "Date": rows["Date"].to_numpy(),
+            "Set Order": set_order_labels(rows["Set Order"]),
+            "Weight": widen(rows["Weight"]),
+            "Reps": widen(rows["Reps"]),
+        })
+    next_cursor = encode_cursor(sort, descending, key[stop - 1], ties[stop - 1]) if stop < total else None
+    return {"total": total, "rows": table, "next_cursor": next_cursor}
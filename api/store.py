@@ -0,0 +1,260 @@
+"""
+Immutable, indexed workout store.
+
+The log is loaded once into a typed frame sorted by (exercise, date), with
+exercise names as a categorical and an offsets index giving each exercise's
+contiguous row slice. Exercise and date-range lookups are binary searches that
+return zero-copy slices instead of scanning and copying the whole table.
+"""
+from datetime import date, datetime
+from functools import cached_property
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from api.telemetry import span
+
+if TYPE_CHECKING:  # these modules build on this one's helpers, so they are imported lazily below
+    from api.aggregates import DailyAggregates
+    from api.lifts import LiftIndex
+    from api.training_load import TrainingLoad
+
+COLUMNS = ["Date", "Exercise Name", "Set Order", "Weight", "Reps"]
+# Kept when the export has it (Strong leaves it blank unless RPE tracking is on).
+OPTIONAL_COLUMNS = ["RPE"]
+STORE_COLUMNS = COLUMNS + OPTIONAL_COLUMNS
+
+# Strong marks warm-up, drop and failure sets with a letter instead of a number.
+SET_ORDER_CODES = {"W": -1, "D": -2, "F": -3}
+SET_ORDER_LABELS = {code: label for label, code in SET_ORDER_CODES.items()}
+
+DateLike = str | date | datetime | pd.Timestamp | None
+
+
+def encode_set_order(values: pd.Series) -> np.ndarray:
+    """Set Order as int16, with W/D/F sets mapped to negative codes."""
+    if pd.api.types.is_integer_dtype(values):
+        return values.to_numpy(dtype=np.int16)
+    cat = pd.Categorical(values.astype(str).str.strip())
+    # Only the distinct labels are converted in Python; rows are mapped by code.
+    labels = [SET_ORDER_CODES.get(c, None) for c in cat.categories]
+    mapping = np.array([int(float(c)) if code is None else code for c, code in zip(cat.categories, labels)], dtype=np.int16)
+    return mapping[cat.codes] if len(mapping) else np.zeros(len(values), dtype=np.int16)
+
+
+def set_order_labels(values) -> np.ndarray:
+    """Inverse of `encode_set_order`, for display."""
+    values = np.asarray(values)
+    return np.array([SET_ORDER_LABELS.get(v, str(v)) for v in values.tolist()], dtype=object)
+
+
+def widen(values) -> np.ndarray:
+    """float32 column as float64, rounded so 13.2 comes back as 13.2 rather than 13.19999980926."""
+    return np.round(np.asarray(values, dtype=np.float64), 4)
+
+
+def parse_workout_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize columns and ensure compact dtypes."""
+    out = df[[c for c in STORE_COLUMNS if c in df.columns]].copy()
+    if not pd.api.types.is_datetime64_any_dtype(out["Date"]):
+        out["Date"] = pd.to_datetime(out["Date"])
+    out["Exercise Name"] = out["Exercise Name"].astype("category")
+    out["Set Order"] = encode_set_order(out["Set Order"])
+    out["Weight"] = out["Weight"].astype(np.float32)
+    out["Reps"] = out["Reps"].astype(np.float32)
+    out["RPE"] = out["RPE"].astype(np.float32) if "RPE" in out else np.float32("nan")
+    return out
+
+
+def day_start(value: DateLike) -> np.datetime64 | None:
+    """Inclusive lower bound: midnight of the given day."""
+    if value is None:
+        return None
+    return pd.Timestamp(value).normalize().to_datetime64()
+
+
+def day_end(value: DateLike) -> np.datetime64 | None:
+    """Exclusive upper bound: midnight after the given day."""
+    if value is None:
+        return None
+    return (pd.Timestamp(value).normalize() + pd.Timedelta(days=1)).to_datetime64()
+
+
+class WorkoutStore:
+    """Workout sets sorted by (exercise, date) with a per-exercise offsets index."""
+
+    # Where the store's source export ends (api.ingest.ExportMark), so a newer
+    # cumulative export can be checked against it and only its tail parsed
+    source = None
+
+    def __init__(self, df: pd.DataFrame):
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]) or df["Weight"].dtype != np.float32:
+            df = parse_workout_df(df)
+        df = df[STORE_COLUMNS].dropna(subset=["Date", "Exercise Name"])
+        # Categories come out sorted, so sorting by code sorts by exercise name.
+        names = pd.Categorical(df["Exercise Name"].astype(str))
+        order = np.lexsort((df["Date"].to_numpy(), names.codes))
+        frame = df.iloc[order].reset_index(drop=True)
+        frame["Date"] = frame["Date"].astype("datetime64[ns]")
+        frame["Exercise Name"] = names.take(order)
+        self._index(frame, by_date=None)
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, np.ndarray], exercises) -> "WorkoutStore":
+        """Store over already sorted and indexed column arrays (see `columns`), without copying them.
+
+        Used to map stores kept in shared memory or memory-mapped cache files.
+        """
+        frame = pd.DataFrame({
+            "Date": columns["Date"],
+            "Exercise Name": pd.Categorical.from_codes(columns["codes"], categories=list(exercises)),
+            **{c: columns[c] for c in STORE_COLUMNS[2:]},
+        }, copy=False)
+        store = cls.__new__(cls)
+        store._index(frame, by_date=columns["by_date"])
+        return store
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """The store's column arrays plus its date permutation; inverse of `from_columns`."""
+        return {
+            "codes": self.frame["Exercise Name"].cat.codes.to_numpy(),
+            **{c: self.frame[c].to_numpy() for c in STORE_COLUMNS if c != "Exercise Name"},
+            "by_date": self.by_date,
+        }
+
+    def _index(self, frame: pd.DataFrame, by_date: np.ndarray | None) -> None:
+        self.frame = frame
+        codes = frame["Exercise Name"].cat.codes.to_numpy()
+        self.exercises = frame["Exercise Name"].cat.categories.to_numpy(dtype=object)
+        self.offsets = np.searchsorted(codes, np.arange(len(self.exercises) + 1), side="left").astype(np.int64)
+        self.dates = frame["Date"].to_numpy()
+        # Secondary permutation for all-exercise date-range queries.
+        self.by_date = np.argsort(self.dates, kind="stable") if by_date is None else by_date
+        self._sorted_dates = self.dates[self.by_date]
+        for arr in (self.exercises, self.offsets, self.dates, self.by_date, self._sorted_dates):
+            arr.flags.writeable = False
+
+    def append(self, tail: pd.DataFrame) -> "WorkoutStore":
+        """New store with `tail` appended; every tail set must be newer than this store's last set.
+
+        Each tail set is inserted at the end of its exercise's slice, so existing
+        rows keep their order and are only shifted, never re-sorted; the exercise
+        categories are reused (extended by any new exercises), and the index and
+        aggregates are extended rather than rebuilt.
+        """
+        if not pd.api.types.is_datetime64_any_dtype(tail["Date"]) or tail["Weight"].dtype != np.float32:
+            tail = parse_workout_df(tail)
+        tail = tail[STORE_COLUMNS].dropna(subset=["Date", "Exercise Name"])
+        if tail.empty:
+            return self
+        names = tail["Exercise Name"].astype(str).to_numpy(dtype=object)
+        categories = self.exercises
+        codes = self.frame["Exercise Name"].cat.codes.to_numpy()
+        unseen = np.setdiff1d(names, categories)
+        if len(unseen):
+            # Old codes are remapped through the (still sorted) extended categories
+            categories = np.union1d(categories, unseen)
+            codes = np.searchsorted(categories, self.exercises)[codes]
+        tail_codes = np.searchsorted(categories, names)
+        dates = tail["Date"].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort((dates, tail_codes))
+        tail_codes, dates = tail_codes[order], dates[order]
+        # Row before which each tail set goes: the end of its exercise's slice
+        ends = np.searchsorted(codes, tail_codes, side="right")
+        columns = {
+            "codes": np.insert(codes, ends, tail_codes),
+            "Date": np.insert(self.dates, ends, dates),
+            **{c: np.insert(self.frame[c].to_numpy(), ends, tail[c].to_numpy()[order]) for c in STORE_COLUMNS[2:]},
+        }
+        rows = np.arange(len(self))
+        moved = rows + np.searchsorted(ends, rows, side="right")
+        placed = ends + np.arange(len(tail))
+        columns["by_date"] = np.concatenate([moved[self.by_date], placed[np.argsort(dates, kind="stable")]])
+
+        store = WorkoutStore.from_columns(columns, categories)
+        with span("aggregate"):
+            if "aggregates" in self.__dict__:
+                store.__dict__["aggregates"] = self.aggregates.extended(tail)
+            if "lifts" in self.__dict__:
+                store.__dict__["lifts"] = self.lifts.extended(tail)
+        return store
+
+    @cached_property
+    def aggregates(self) -> "DailyAggregates":
+        from api.aggregates import DailyAggregates  # aggregates builds on this module's helpers
+
+        with span("aggregate"):
+            return DailyAggregates.from_frame(self.frame)
+
+    @cached_property
+    def lifts(self) -> "LiftIndex":
+        from api.lifts import LiftIndex
+
+        with span("aggregate"):
+            return LiftIndex.from_frame(self.frame)
+
+    @cached_property
+    def training_load(self) -> "TrainingLoad":
+        from api.training_load import TrainingLoad
+
+        aggregates = self.aggregates
+        with span("aggregate"):
+            return TrainingLoad.from_aggregates(aggregates)
+
+    @property
+    def last_set(self) -> pd.Timestamp | None:
+        """High-water mark: timestamp of the newest set in the store."""
+        return pd.Timestamp(self._sorted_dates[-1]) if len(self) else None
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.frame.memory_usage(deep=True).sum() + self.by_date.nbytes + self._sorted_dates.nbytes)
+
+    def exercise_bounds(self, exercise: str) -> tuple[int, int]:
+        """Row slice [lo, hi) for an exercise; (0, 0) if unknown."""
+        i = int(np.searchsorted(self.exercises, exercise))
+        if i >= len(self.exercises) or self.exercises[i] != exercise:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def exercise_range(self, exercise: str, start: DateLike = None, end: DateLike = None) -> tuple[int, int]:
+        """Row slice [lo, hi) for an exercise within an inclusive day range."""
+        lo, hi = self.exercise_bounds(exercise)
+        dates = self.dates[lo:hi]
+        a = lo if start is None else lo + int(np.searchsorted(dates, day_start(start), side="left"))
+        b = hi if end is None else lo + int(np.searchsorted(dates, day_end(end), side="left"))
+        return a, max(a, b)
+
+    def exercise(self, exercise: str, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Sets for one exercise (optionally within a day range), as a slice of the store."""
+        lo, hi = self.exercise_range(exercise, start, end)
+        return self.frame.iloc[lo:hi]
+
+    def between(self, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Sets for all exercises within an inclusive day range, in date order."""
+        lo = 0 if start is None else int(np.searchsorted(self._sorted_dates, day_start(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self._sorted_dates, day_end(end), side="left"))
+        return self.frame.take(self.by_date[lo:max(lo, hi)])
+
+    def date_bounds(self, exercise: str | None = None) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
+        """First and last set timestamps, overall or for one exercise."""
+        if exercise is None:
+            dates = self._sorted_dates
+        else:
+            lo, hi = self.exercise_bounds(exercise)
+            dates = self.dates[lo:hi]
+        if not len(dates):
+            return None, None
+        return pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])
+
+    def exercise_totals(self) -> dict[str, dict[str, float]]:
+        """Set count and rep sum per exercise, straight from the offsets index."""
+        sets = np.diff(self.offsets)
+        reps = np.add.reduceat(widen(self.frame["Reps"].fillna(0)), self.offsets[:-1]) if len(self) else []
+        return {
+            name: {"sets": int(n), "reps": float(r)} for name, n, r in zip(self.exercises, sets, reps)
+        }
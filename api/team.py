@@ -0,0 +1,233 @@
+"""
+Team mode: many athletes' training in one store for cross-athlete queries.
+
+Each registered export contributes its per-(exercise, day) aggregate rows (see
+api.aggregates), tagged with an athlete code, to one table sorted by day. A
+date window is then two binary searches, and leaderboards, relative strength
+and volume percentiles are grouped NumPy/pandas reductions keyed by athlete
+code over the rows in the window, with no Python loop per athlete or per set.
+Lift groups (api.lifts) are resolved once per distinct exercise name.
+
+Relative strength divides by the bodyweight given at registration (Strong
+exports don't carry it), in the same unit as the export's weights.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from api.lifts import LiftGroup, configured_lift_groups
+from api.queries import UnknownLiftGroups
+from api.store import DateLike, day_end, day_start
+
+METRICS = {"e1rm": "max_1rm", "weight": "max_weight"}
+VALUE_COLUMNS = ["max_1rm", "max_weight", "sets", "reps", "volume"]
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class UnknownAthlete(LookupError):
+    """The athlete is not registered in the team."""
+
+
+@dataclass(frozen=True)
+class Athlete:
+    athlete_id: str
+    dataset_id: str
+    bodyweight: float | None = None
+    registered: float = 0.0
+
+
+class TeamStore:
+    """Per-(athlete, exercise, day) aggregates of a team, sorted by day."""
+
+    def __init__(self, daily: pd.DataFrame, athletes: list[Athlete], exercises: list[str],
+                 groups: tuple[LiftGroup, ...] | None = None):
+        # `daily` has integer athlete/exercise codes indexing `athletes`/`exercises`.
+        self.daily = daily
+        self.athletes = athletes
+        self.exercises = exercises
+        self.groups = configured_lift_groups() if groups is None else groups
+        self.codes = {a.athlete_id: i for i, a in enumerate(athletes)}
+        self.athlete_ids = np.array([a.athlete_id for a in athletes], dtype=object)
+        self.bodyweight = np.array([np.nan if a.bodyweight is None else a.bodyweight for a in athletes], dtype=np.float64)
+        self.days = daily["day"].to_numpy()
+        self.athlete_codes = daily["athlete"].to_numpy()
+        self.exercise_codes = daily["exercise"].to_numpy()
+        names = np.array(exercises, dtype=object)
+        self.members = {g.name: np.fromiter((g.matches(e) for e in names), bool, len(names)) for g in self.groups}
+
+    @classmethod
+    def empty(cls, groups: tuple[LiftGroup, ...] | None = None) -> "TeamStore":
+        daily = pd.DataFrame({
+            "athlete": np.empty(0, np.int32), "exercise": np.empty(0, np.int32), "day": np.empty(0, "datetime64[ns]"),
+            **{c: np.empty(0, np.float64) for c in VALUE_COLUMNS},
+        })
+        return cls(daily, [], [], groups)
+
+    def __len__(self) -> int:
+        return len(self.daily)
+
+    def with_athlete(self, athlete: Athlete, exercise_daily: pd.DataFrame) -> "TeamStore":
+        """New store with the athlete's daily aggregates added, replacing any earlier registration."""
+        code = self.codes.get(athlete.athlete_id, len(self.athletes))
+        athletes = list(self.athletes)
+        athletes[code:code + 1] = [athlete]
+        exercises = list(self.exercises)
+        lookup = {name: i for i, name in enumerate(exercises)}
+        names = pd.Categorical(exercise_daily["exercise"])
+        for name in names.categories:  # distinct names only
+            if name not in lookup:
+                lookup[name] = len(exercises)
+                exercises.append(name)
+        category_codes = np.array([lookup[name] for name in names.categories], dtype=np.int32)
+        rows = pd.DataFrame({
+            "athlete": np.full(len(exercise_daily), code, dtype=np.int32),
+            "exercise": category_codes[names.codes] if len(category_codes) else np.empty(0, np.int32),
+            "day": exercise_daily["day"].to_numpy(dtype="datetime64[ns]"),
+            **{c: exercise_daily[c].to_numpy(dtype=np.float64) for c in VALUE_COLUMNS},
+        })
+        kept = self.daily[self.athlete_codes != code]
+        daily = pd.concat([kept, rows], ignore_index=True)
+        daily = daily.take(np.argsort(daily["day"].to_numpy(), kind="stable")).reset_index(drop=True)
+        return TeamStore(daily, athletes, exercises, self.groups)
+
+    def without_athlete(self, athlete_id: str) -> "TeamStore":
+        """New store without the athlete; later athletes shift down one code."""
+        if athlete_id not in self.codes:
+            raise UnknownAthlete(f"Unknown athlete: {athlete_id}")
+        code = self.codes[athlete_id]
+        daily = self.daily[self.athlete_codes != code].reset_index(drop=True)
+        daily["athlete"] = np.where(daily["athlete"].to_numpy() > code, daily["athlete"].to_numpy() - 1, daily["athlete"].to_numpy()).astype(np.int32)
+        return TeamStore(daily, [a for a in self.athletes if a.athlete_id != athlete_id], self.exercises, self.groups)
+
+    def window(self, start: DateLike = None, end: DateLike = None) -> tuple[int, int]:
+        """Row slice [lo, hi) for an inclusive day range."""
+        lo = 0 if start is None else int(np.searchsorted(self.days, day_start(start), side="left"))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, day_end(end), side="left"))
+        return lo, max(lo, hi)
+
+    def _group_rows(self, group: str, start: DateLike, end: DateLike) -> np.ndarray:
+        """Row positions of a lift group's exercises in the window."""
+        if group not in self.members:
+            raise UnknownLiftGroups(f"Unknown lift group(s): {group}")
+        lo, hi = self.window(start, end)
+        return lo + np.flatnonzero(self.members[group][self.exercise_codes[lo:hi]])
+
+    def _best(self, rows: np.ndarray, column: str) -> np.ndarray:
+        """Per athlete, the row with the highest `column` value (earliest on ties)."""
+        values = self.daily[column].to_numpy()[rows]
+        valid = ~np.isnan(values)
+        rows, values = rows[valid], values[valid]
+        athletes = self.athlete_codes[rows]
+        order = np.lexsort((self.days[rows], -values, athletes))
+        _, first = np.unique(athletes[order], return_index=True)
+        return rows[order[first]]
+
+    def leaderboard(self, group: str, metric: str = "e1rm", start: DateLike = None, end: DateLike = None,
+                    relative: bool = False, limit: int | None = None) -> pd.DataFrame:
+        """Each athlete's best set day for a lift group, ranked by the metric (or metric per bodyweight)."""
+        column = METRICS[metric]
+        best = self._best(self._group_rows(group, start, end), column)
+        athletes = self.athlete_codes[best]
+        board = pd.DataFrame({
+            "athlete_id": self.athlete_ids[athletes],
+            "exercise": np.array(self.exercises, dtype=object)[self.exercise_codes[best]] if len(best) else [],
+            "date": self.days[best],
+            "value": self.daily[column].to_numpy()[best],
+            "bodyweight": self.bodyweight[athletes],
+        })
+        board["relative"] = board["value"] / board["bodyweight"]
+        key = "relative" if relative else "value"
+        if relative:
+            board = board[board["relative"].notna()]
+        board = board.sort_values([key, "date"], ascending=[False, True], kind="stable").reset_index(drop=True)
+        board.insert(0, "rank", board[key].rank(method="min", ascending=False).astype(np.int64))
+        return board if limit is None else board.head(limit)
+
+    def relative_strength(self, groups: list[str] | None = None, metric: str = "e1rm", start: DateLike = None,
+                          end: DateLike = None) -> pd.DataFrame:
+        """Per athlete, best metric per lift group divided by bodyweight, plus the groups' total per bodyweight.
+
+        The total is only given to athletes with a result in every group.
+        """
+        groups = list(self.members) if groups is None else groups
+        column = METRICS[metric]
+        n = len(self.athletes)
+        out = pd.DataFrame({"athlete_id": self.athlete_ids, "bodyweight": self.bodyweight})
+        total = np.zeros(n)
+        for group in groups:  # per lift group, vectorized across athletes
+            best = self._best(self._group_rows(group, start, end), column)
+            values = np.full(n, np.nan)
+            values[self.athlete_codes[best]] = self.daily[column].to_numpy()[best]
+            out[group] = values
+            total += values
+        out["total"] = total if groups else np.nan
+        for name in [*groups, "total"]:
+            out[f"{name}_relative"] = out[name] / out["bodyweight"]
+        out = out.sort_values("total_relative", ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+        out.insert(0, "rank", out["total_relative"].rank(method="min", ascending=False))  # NaN without a total
+        return out
+
+    def volume_percentiles(self, start: DateLike = None, end: DateLike = None,
+                           percentiles: tuple[int, ...] = PERCENTILES) -> dict:
+        """Per-athlete volume, sets and training days over a window, with each athlete's
+        percentile rank among athletes who trained in it and the team's volume distribution.
+        """
+        lo, hi = self.window(start, end)
+        n = len(self.athletes)
+        athletes = self.athlete_codes[lo:hi]
+        window = self.daily.iloc[lo:hi]
+        volume = np.bincount(athletes, weights=window["volume"].fillna(0).to_numpy(), minlength=n)
+        sets = np.bincount(athletes, weights=window["sets"].to_numpy(), minlength=n)
+        sessions = pd.DataFrame({"athlete": athletes, "day": window["day"].to_numpy().astype("datetime64[D]")}).drop_duplicates()
+        days = np.bincount(sessions["athlete"].to_numpy(), minlength=n)
+        out = pd.DataFrame({
+            "athlete_id": self.athlete_ids, "volume": volume, "sets": sets.astype(np.int64), "days": days,
+        })
+        out = out[out["days"] > 0]
+        out["volume_per_day"] = out["volume"] / out["days"]
+        out["percentile"] = out["volume"].rank(method="max", pct=True) * 100
+        out = out.sort_values("volume", ascending=False, kind="stable").reset_index(drop=True)
+        distribution = {f"p{p}": float(np.percentile(out["volume"], p)) if len(out) else None for p in percentiles}
+        return {"athletes": out, "distribution": distribution}
+
+    def summary(self) -> dict:
+        sets = np.bincount(self.athlete_codes, weights=self.daily["sets"].to_numpy(), minlength=len(self.athletes))
+        return {
+            "athletes": [
+                {"athlete_id": a.athlete_id, "dataset_id": a.dataset_id, "bodyweight": a.bodyweight, "sets": int(s)}
+                for a, s in zip(self.athletes, sets)
+            ],
+            "rows": len(self),
+            "exercises": len(self.exercises),
+            "groups": list(self.members),
+        }
+
+
+class TeamRegistry:
+    """Team stores by team ID. Stores are immutable; updates swap them under a lock."""
+
+    def __init__(self):
+        self._teams: dict[str, TeamStore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, team_id: str) -> TeamStore | None:
+        return self._teams.get(team_id)
+
+    def register(self, team_id: str, athlete_id: str, dataset_id: str, exercise_daily: pd.DataFrame,
+                 bodyweight: float | None = None) -> TeamStore:
+        athlete = Athlete(athlete_id, dataset_id, bodyweight, time.time())
+        with self._lock:
+            team = self._teams.get(team_id) or TeamStore.empty()
+            self._teams[team_id] = team = team.with_athlete(athlete, exercise_daily)
+        return team
+
+    def remove(self, team_id: str, athlete_id: str) -> TeamStore:
+        with self._lock:
+            team = self._teams.get(team_id)
+            if team is None:
+                raise UnknownAthlete(f"Unknown athlete: {athlete_id}")
+            self._teams[team_id] = team = team.without_athlete(athlete_id)
+        return team
@@ -0,0 +1,242 @@
+"""
+Per-stage timing, Prometheus metrics and an opt-in sampling profiler.
+
+Hot paths wrap their stages in `span(...)`: ingest (with parse inside it),
+aggregate, filter, downsample, serialise and render. Every span adds its
+duration to a per-stage histogram, and spans that run inside a `trace()` (one
+per API request or Shiny update) are also collected there, for the API's
+Server-Timing header. Engine worker processes trace their jobs and ship the
+spans back with the result (`record`), so the stages of a query that ran in a
+worker still show up in the server's trace and histograms.
+
+`metrics.exposition()` renders everything in the Prometheus text format.
+
+`SamplingProfiler` samples the stacks of the threads doing one request's work
+at a fixed interval and counts them as collapsed stacks (`frame;frame;frame
+count`, one per line), the input format of flamegraph.pl, speedscope and
+inferno. Sampled threads are the thread that entered it (the server's event
+loop), but only while `exclusive()` says no other request shares it, and
+threads running one of the request's jobs (`profiled_call`). Engine jobs in a
+worker process are profiled there and their stacks merged back (`merge`).
+Threads parked in a blocking wait (an idle event loop) are skipped.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_INTERVAL = 0.001  # seconds between stack samples
+# Modules whose frames at the top of a stack mean the thread is waiting, not working
+IDLE_MODULES = frozenset({"threading", "selectors", "queue", "asyncio.base_events", "asyncio.runners"})
+
+_trace: ContextVar[list[tuple[str, float]] | None] = ContextVar("lift_metrics_trace", default=None)
+_profiler: ContextVar["SamplingProfiler | None"] = ContextVar("lift_metrics_profiler", default=None)
+
+
+def _labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Counters and histograms by name and labels, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, list]] = {}  # labels -> [bucket counts..., sum, count]
+        self._buckets: dict[str, tuple[float, ...]] = {}
+
+    def counter(self, name: str, help: str) -> None:
+        self._help[name] = ("counter", help)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = STAGE_BUCKETS) -> None:
+        self._help[name] = ("histogram", help)
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = buckets
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        buckets = self._buckets[name]
+        with self._lock:
+            state = self._histograms[name].setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def exposition(self, gauges: dict[str, tuple[str, float]] | None = None,
+                   counters: dict[str, tuple[str, float]] | None = None) -> str:
+        """All metrics, plus `gauges` and `counters` (name -> (help, value)) sampled by the caller, as Prometheus text."""
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines += [f"# HELP {name} {self._help[name][1]}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_labels(key)} {_number(value)}" for key, value in sorted(series.items())]
+            for name, series in self._histograms.items():
+                lines += [f"# HELP {name} {self._help[name][1]}", f"# TYPE {name} histogram"]
+                for key, state in sorted(series.items()):
+                    for bound, count in zip(self._buckets[name], state):
+                        le = 'le="%s"' % _number(bound)
+                        lines.append(f"{name}_bucket{_labels(key, le)} {count}")
+                    le = 'le="+Inf"'
+                    lines.append(f"{name}_bucket{_labels(key, le)} {state[-1]}")
+                    lines.append(f"{name}_sum{_labels(key)} {state[-2]!r}")
+                    lines.append(f"{name}_count{_labels(key)} {state[-1]}")
+        for kind, sampled in (("gauge", gauges), ("counter", counters)):
+            for name, (help, value) in (sampled or {}).items():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.histogram("lift_metrics_stage_seconds", "Time spent per pipeline stage.")
+
+
+@contextmanager
+def trace():
+    """Collect the (stage, seconds) spans that run in this context, including
+    those in thread-pool calls made from it."""
+    spans: list[tuple[str, float]] = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into its histogram and the current trace, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record([(stage, time.perf_counter() - started)])
+
+
+def record(spans: list[tuple[str, float]]) -> None:
+    """Add spans measured elsewhere (e.g. in an engine worker) to the histograms and current trace."""
+    current = _trace.get()
+    for stage, seconds in spans:
+        metrics.observe("lift_metrics_stage_seconds", seconds, stage=stage)
+        if current is not None:
+            current.append((stage, seconds))
+
+
+def server_timing(spans: list[tuple[str, float]], total: float | None = None) -> str:
+    """Server-Timing header value, with repeated stages summed, in milliseconds."""
+    durations: dict[str, float] = {}
+    for stage, seconds in spans:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items())
+
+
+class SamplingProfiler:
+    """Counts the stacks of one request's threads every `interval` seconds while active."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, exclusive: Callable[[], bool] = lambda: True):
+        self.interval = interval
+        self.exclusive = exclusive
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._jobs: Counter = Counter()  # thread ident -> jobs of this request it is running
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._owner = threading.get_ident()
+        self._token = _profiler.set(self)
+        self._thread = threading.Thread(target=self._run, name="lift-metrics-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        _profiler.reset(self._token)
+
+    @contextmanager
+    def job(self):
+        """Sample the calling thread while it runs one of the profiled request's jobs."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._jobs[ident] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs[ident] -= 1
+                if not self._jobs[ident]:
+                    del self._jobs[ident]
+
+    def merge(self, stacks: Counter) -> None:
+        """Add stacks sampled elsewhere (e.g. in an engine worker process)."""
+        with self._lock:
+            self.stacks.update(stacks)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            with self._lock:
+                threads = set(self._jobs)
+            if self.exclusive():
+                threads.add(self._owner)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None or frame.f_globals.get("__name__") in IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one `frame;frame;frame count` line per distinct stack."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def current_profiler() -> SamplingProfiler | None:
+    """The profiler of the request this context belongs to, if it is being profiled."""
+    return _profiler.get()
+
+
+def profiled_call(fn, *args):
+    """Call `fn` as a job of the current request's profiler, if any; for thread-pool calls, which inherit the context."""
+    profiler = _profiler.get()
+    if profiler is None:
+        return fn(*args)
+    with profiler.job():
+        return fn(*args)
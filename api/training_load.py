@@ -0,0 +1,183 @@
+"""
+Rolling training-load analytics over the daily aggregates.
+
+Built once per dataset from the per-day and per-(exercise, day) tables in
+api.aggregates, each series in one vectorized O(n) pass, and kept on the
+store; a date range is a binary-searched slice of the precomputed series, so
+windows that start mid-history still see the training before them.
+
+- Calendar-day volume with acute (7-day) and chronic (28-day) rolling means
+  and their ratio (ACWR), from prefix sums. ACWR is undefined until a full
+  chronic window of history exists.
+- Fitness and fatigue: exponentially weighted daily volume with 42- and 7-day
+  time constants (Banister's impulse-response model), and form = fitness -
+  fatigue.
+- Weekly tonnage (weeks start on Monday).
+- Per exercise, a rolling 1RM trend over the last 28 days of training: the
+  mean of the daily max Epley 1RM and its least-squares slope per week, from
+  rolling sums of x, y, xy and x^2 within each exercise's slice.
+"""
+import numpy as np
+import pandas as pd
+
+from api.aggregates import DailyAggregates
+from api.store import DateLike, day_end, day_start
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+FITNESS_DAYS = 42
+FATIGUE_DAYS = 7
+TREND_DAYS = 28
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of each value and the window - 1 before it (fewer at the start)."""
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    idx = np.arange(1, len(values) + 1)
+    return prefix[idx] - prefix[np.maximum(idx - window, 0)]
+
+
+def _ewma(values: np.ndarray, time_constant: float) -> np.ndarray:
+    alpha = 1 - np.exp(-1 / time_constant)
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _calendar(daily_volume: pd.DataFrame) -> pd.DataFrame:
+    """Daily volume on every calendar day from the first to the last training day (0 on rest days)."""
+    if daily_volume.empty:
+        return pd.DataFrame({"day": np.empty(0, "datetime64[ns]"), "volume": np.empty(0), "sets": np.empty(0)})
+    days = daily_volume["day"].to_numpy().astype("datetime64[D]")
+    position = (days - days[0]).astype(np.int64)
+    n = int(position[-1]) + 1
+    volume, sets = np.zeros(n), np.zeros(n)
+    volume[position] = np.nan_to_num(daily_volume["volume"].to_numpy(dtype=np.float64))
+    sets[position] = daily_volume["sets"].to_numpy(dtype=np.float64)
+    calendar = days[0] + np.arange(n).astype("timedelta64[D]")
+    return pd.DataFrame({"day": calendar.astype("datetime64[ns]"), "volume": volume, "sets": sets})
+
+
+def load_series(daily_volume: pd.DataFrame) -> pd.DataFrame:
+    """Per calendar day: volume, acute and chronic load, ACWR, fitness, fatigue and form."""
+    out = _calendar(daily_volume)
+    volume = out["volume"].to_numpy()
+    acute = _rolling_sum(volume, ACUTE_DAYS) / ACUTE_DAYS
+    chronic = _rolling_sum(volume, CHRONIC_DAYS) / CHRONIC_DAYS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acwr = np.where(chronic > 0, acute / chronic, np.nan)
+    acwr[:CHRONIC_DAYS - 1] = np.nan
+    fitness = _ewma(volume, FITNESS_DAYS)
+    fatigue = _ewma(volume, FATIGUE_DAYS)
+    out["acute"] = acute
+    out["chronic"] = chronic
+    out["acwr"] = acwr
+    out["fitness"] = fitness
+    out["fatigue"] = fatigue
+    out["form"] = fitness - fatigue
+    return out
+
+
+def weekly_tonnage(calendar: pd.DataFrame) -> pd.DataFrame:
+    """Volume, sets and training days per Monday-starting week."""
+    if calendar.empty:
+        return pd.DataFrame({"week": np.empty(0, "datetime64[ns]"), "volume": np.empty(0), "sets": np.empty(0), "days": np.empty(0, np.int64)})
+    days = calendar["day"].to_numpy().astype("datetime64[D]")
+    # 1970-01-01 was a Thursday; shift so week numbers roll over on Mondays.
+    week = (days.astype(np.int64) + 3) // 7
+    starts = np.flatnonzero(np.r_[True, week[1:] != week[:-1]])
+    volume = calendar["volume"].to_numpy()
+    sets = calendar["sets"].to_numpy()
+    return pd.DataFrame({
+        "week": (week[starts] * 7 - 3).astype("datetime64[D]").astype("datetime64[ns]"),
+        "volume": np.add.reduceat(volume, starts),
+        "sets": np.add.reduceat(sets, starts),
+        "days": np.add.reduceat((volume > 0).astype(np.int64), starts),
+    })
+
+
+def exercise_trends(exercise_daily: pd.DataFrame) -> pd.DataFrame:
+    """Per (exercise, training day): max 1RM, its rolling mean and least-squares slope per week
+    over the trailing TREND_DAYS, computed for all exercises in one pass.
+    """
+    names = exercise_daily["exercise"].to_numpy()
+    days = exercise_daily["day"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    y = exercise_daily["max_1rm"].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(y)
+    _, code = np.unique(names, return_inverse=True)
+    # Rows are sorted by (exercise, day), so (exercise, day) keys are sorted too and
+    # each row's window start is one binary search that can't cross into another exercise.
+    x = (days - (days.min() if len(days) else 0)).astype(np.float64)
+    key = code.astype(np.int64) * (1 << 32) + x.astype(np.int64)
+    start = np.searchsorted(key, key - (TREND_DAYS - 1), side="left")
+    stop = np.arange(1, len(key) + 1)
+
+    def window(values):
+        prefix = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+        return prefix[stop] - prefix[start]
+
+    n, sx, sy = window(np.ones_like(y)), window(x), window(y)
+    sxx, sxy = window(x * x), window(x * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = n * sxx - sx * sx
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        trend = np.where(n > 0, sy / n, np.nan)
+    return pd.DataFrame({
+        "exercise": names,
+        "day": exercise_daily["day"].to_numpy(),
+        "max_1rm": y,
+        "trend": trend,
+        "slope_per_week": slope * 7,
+        "sessions": n.astype(np.int64),
+    })
+
+
+class TrainingLoad:
+    """Precomputed load series, weekly tonnage and per-exercise 1RM trends, sliced by date range."""
+
+    def __init__(self, daily: pd.DataFrame, weekly: pd.DataFrame, trends: pd.DataFrame):
+        self.daily = daily
+        self.weekly = weekly
+        self.trends = trends
+        self.days = daily["day"].to_numpy()
+        self.weeks = weekly["week"].to_numpy()
+        self.trend_exercises, starts = np.unique(trends["exercise"].to_numpy(), return_index=True)
+        self.trend_offsets = np.append(starts, len(trends)).astype(np.int64)
+        self.trend_days = trends["day"].to_numpy()
+
+    @classmethod
+    def from_aggregates(cls, aggregates: DailyAggregates) -> "TrainingLoad":
+        daily = load_series(aggregates.daily_volume)
+        return cls(daily, weekly_tonnage(daily), exercise_trends(aggregates.exercise_daily))
+
+    @staticmethod
+    def _slice(days: np.ndarray, start: DateLike, end: DateLike, lo: int = 0, hi: int | None = None) -> tuple[int, int]:
+        hi = len(days) if hi is None else hi
+        a = lo if start is None else lo + int(np.searchsorted(days[lo:hi], day_start(start), side="left"))
+        b = hi if end is None else lo + int(np.searchsorted(days[lo:hi], day_end(end), side="left"))
+        return a, max(a, b)
+
+    def series(self, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        lo, hi = self._slice(self.days, start, end)
+        return self.daily.iloc[lo:hi]
+
+    def weekly_tonnage(self, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Weeks whose Monday falls in the range (widened to include the week holding `start`)."""
+        if start is not None:
+            start = pd.Timestamp(start).normalize() - pd.Timedelta(days=pd.Timestamp(start).weekday())
+        lo, hi = self._slice(self.weeks, start, end)
+        return self.weekly.iloc[lo:hi]
+
+    def trend(self, exercise: str, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        i = int(np.searchsorted(self.trend_exercises, exercise))
+        if i >= len(self.trend_exercises) or self.trend_exercises[i] != exercise:
+            return self.trends.iloc[0:0]
+        lo, hi = self._slice(self.trend_days, start, end, int(self.trend_offsets[i]), int(self.trend_offsets[i + 1]))
+        return self.trends.iloc[lo:hi]
+
+    def latest(self, end: DateLike = None) -> dict:
+        """Load figures on the last day of the range (or of the data)."""
+        _, hi = self._slice(self.days, None, end)
+        if hi == 0:
+            return {"day": None, **{c: None for c in ("acute", "chronic", "acwr", "fitness", "fatigue", "form")}}
+        row = self.daily.iloc[hi - 1]
+        return {"day": str(pd.Timestamp(row["day"]).date()),
+                **{c: None if np.isnan(row[c]) else float(row[c]) for c in ("acute", "chronic", "acwr", "fitness", "fatigue", "form")}}
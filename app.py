@@ -1,17 +1,55 @@
+import asyncio
+import functools
+import logging
+import os
+from collections import Counter
+
 import numpy as np
 import pandas as pd
 from htmltools import head_content
 from shiny import App, Inputs, Outputs, Session, reactive, render, req, ui
 from shiny.types import FileInfo
-from shinywidgets import output_widget, render_widget
-from plotnine import ggplot, aes, geom_line, geom_point, scale_x_datetime, theme, element_text, labs
+from starlette.responses import PlainTextResponse
+
+from api import disk_cache
+from api.datasets import Dataset, DatasetStoreFull, dataset_id_for, store_from_env
+from api.downsample import MIN_POINTS, downsample
+from api.ingest import ingest_export
+from api.set_table import set_page
+from api.store import WorkoutStore
+from api.telemetry import metrics, span
+from charts import cache_from_env
+
+DEFAULT_CSV = os.environ.get("LIFT_METRICS_DEFAULT_CSV", "data/strong.csv")
+
+
+@functools.cache
+def default_dataset_id() -> str:
+    """Content hash of the default CSV, taken when the first session needs it rather than at startup."""
+    with open(DEFAULT_CSV, "rb") as f:
+        return dataset_id_for(f)
+
 
-workout_data_og = pd.read_csv("data/strong.csv")[['Date','Exercise Name', 'Set Order', 'Weight', 'Reps']]
-# Contains Dupes
-exercises = workout_data_og['Exercise Name'].tolist()
-exercises.sort()
+# Parsed stores (and their aggregates) shared by all sessions, keyed by content hash.
+# Sessions hold a reference to the dataset they show; unreferenced ones stay cached
+# within the LIFT_METRICS_DATASET_* limits.
+shared_datasets = store_from_env()
+# Parsed stores persisted across restarts (memory-mapped on load), if enabled.
+dataset_cache = disk_cache.cache_from_env()
 
-best_pr = ui.HTML(
+log = logging.getLogger("lift_metrics.pipeline")
+metrics.counter("lift_metrics_reactive_stage_runs_total", "Runs of the expensive reactive stages, by stage.")
+
+# Rendered charts, shared by all sessions
+chart_cache = cache_from_env()
+
+# Sets shown per page of the exercise table
+TABLE_PAGE_ROWS = 100
+
+# Chart points when the Max Chart Points field is left empty
+DEFAULT_CHART_POINTS = 400
+
+award_icon = ui.HTML(
     '<svg xmlns="http://www.w3.org/2000/svg" width="60" height="60" fill="currentColor" class="bi bi-award" viewBox="0 0 16 16"> <path d="M9.669.864 8 0 6.331.864l-1.858.282-.842 1.68-1.337 1.32L2.6 6l-.306 1.854 1.337 1.32.842 1.68 1.858.282L8 12l1.669-.864 1.858-.282.842-1.68 1.337-1.32L13.4 6l.306-1.854-1.337-1.32-.842-1.68zm1.196 1.193.684 1.365 1.086 1.072L12.387 6l.248 1.506-1.086 1.072-.684 1.365-1.51.229L8 10.874l-1.355-.702-1.51-.229-.684-1.365-1.086-1.072L3.614 6l-.25-1.506 1.087-1.072.684-1.365 1.51-.229L8 1.126l1.356.702z"/><path d="M4 11.794V16l4-1 4 1v-4.206l-2.018.306L8 13.126 6.018 12.1z"/></svg>'
 )
 
@@ -25,33 +63,14 @@ app_ui = ui.page_fillable(
             ui.input_file("file_input", "Upload Workout CSV File", accept=[".csv"], multiple=False),
             ui.output_ui("show_exercises"),
             ui.output_ui("count_sets_reps"),
-            ui.input_radio_buttons("analysis", "Analysis Type:", {"1": "1 Rep Max Prediction of Selected Exercise", "2": "Workout Volume Compared to Average Workout Volume" }, selected="1"),
+            ui.input_radio_buttons("analysis", "Analysis Type:", {"1": "1 Rep Max Prediction of Selected Exercise", "2": "Workout Volume Compared to Average Workout Volume", "3": "Training Load (Acute:Chronic Ratio, Fitness and Fatigue)" }, selected="1"),
             ui.output_ui("time_period"),
+            ui.input_numeric("max_points", "Max Chart Points", value=DEFAULT_CHART_POINTS, min=MIN_POINTS, step=50),
         ),
         ui.page_navbar(
                 ui.nav_panel("Analyze",
                     ui.output_ui("pr_text"),
-                    ui.layout_column_wrap(
-                        ui.value_box(
-                            "",
-                            ui.output_text("Bench_pr"),
-                            showcase=best_pr,
-                            theme="green",
-                        ),
-                        ui.value_box(
-                            "",
-                            ui.output_text("Deadlift_pr"),
-                            showcase=best_pr,
-                            theme="blue",
-                        ),
-                        ui.value_box(
-                            "",
-                            ui.output_text("Squat_pr"),
-                            showcase=best_pr,
-                            theme="red",
-                        ),
-                        fill=True,
-                    ),
+                    ui.output_ui("lift_pr_boxes"),
                     ui.output_ui("add_line"),
                     ui.output_ui("add_space"),
                     ui.output_ui("plot_title"),
@@ -61,6 +80,14 @@ app_ui = ui.page_fillable(
                     ui.output_ui("add_space2"),
                     ui.output_ui("data_title"),
                     ui.output_data_frame("show_data"),
+                    ui.panel_conditional("input.analysis === '1'",
+                        ui.layout_columns(
+                            ui.input_action_button("table_prev", "Previous"),
+                            ui.output_ui("table_range"),
+                            ui.input_action_button("table_next", "Next"),
+                            col_widths=(2, 8, 2),
+                        ),
+                    ),
                 ),
                 ui.nav_panel("Purpose",
                     ui.markdown(
@@ -71,8 +98,9 @@ app_ui = ui.page_fillable(
                         This app is designed to help you analyze your workout data from the Strong app. You can upload your workout data and analyze it in two ways:
                         - 1 Rep Max Prediction of Selected Exercise: This analysis will predict your 1 rep max for a selected exercise over a specified time period.
                         - Workout Volume Compared to Average Workout Volume: This analysis will compare your workout volume to the average workout volume over a specified time period.
+                        - Training Load: This analysis tracks your 7-day (acute) and 28-day (chronic) training load and their ratio, exponentially weighted fitness and fatigue, and your weekly tonnage, along with the recent 1 rep max trend of the selected exercise.
 
-                        You can also view your all-time personal bests for the Bench Press, Deadlift, and Squat exercises.
+                        You can also view your all-time personal bests for each lift group: the Bench Press, Deadlift, and Squat by default, or the groups configured by the app's host.
                         
                         ### Instructions
                         To get started, upload your workout data and select the analysis type and exercise you want to analyze.
@@ -92,140 +120,252 @@ app_ui = ui.page_fillable(
 )
 
 def server(input, output, session):
+    # The shared dataset this session shows; a newer cumulative export only appends to it
+    held: list[Dataset] = []
+
+    def release_held():
+        for ds in held:
+            shared_datasets.release(ds.dataset_id)
+        held.clear()
+
+    session.on_ended(release_held)
+
+    # Expensive reactive stages count their runs (per session at DEBUG, in total at
+    # /api/metrics) so the graph can be checked: each should run once per change of
+    # the inputs it reads.
+    stage_runs: Counter = Counter()
+
+    def stage(fn):
+        @functools.wraps(fn)
+        def run():
+            stage_runs[fn.__name__] += 1
+            metrics.inc("lift_metrics_reactive_stage_runs_total", stage=fn.__name__)
+            log.debug("session %s: %s run %d", session.id, fn.__name__, stage_runs[fn.__name__])
+            return fn()
+        return run
+
     @reactive.calc
-    def parse_data() -> pd.DataFrame:
+    def dataset_id() -> str:
         workout_file: list[FileInfo] | None = input.file_input()
         if workout_file is None:
-            return workout_data_og
-        workout_data = pd.read_csv(workout_file[0]["datapath"])[['Date','Exercise Name', 'Set Order', 'Weight', 'Reps']]
-        exercises = workout_data['Exercise Name'].tolist()
-        exercises.sort()
-        return workout_data
+            return default_dataset_id()
+        with open(workout_file[0]["datapath"], "rb") as f:
+            return dataset_id_for(f)
+
+    # The dataset shown, set once it is loaded; the previous one stays up meanwhile
+    shown: reactive.Value[Dataset | None] = reactive.value(None)
+
+    @reactive.effect
+    async def load_dataset():
+        key = dataset_id()
+        if held and held[0].dataset_id == key:
+            return
+        workout_file: list[FileInfo] | None = input.file_input()
+        path = DEFAULT_CSV if workout_file is None else workout_file[0]["datapath"]
+        base = held[0].store if held else None
+        if dataset_cache is None:
+            build = lambda: ingest_export(path, base).store
+        else:
+            build = lambda: dataset_cache.load_or_ingest(key, path, base).store
+        try:
+            # Parsed in a thread, so other sessions keep being served meanwhile
+            with span("ingest"):
+                dataset = await asyncio.to_thread(shared_datasets.acquire, key, build)
+        except (DatasetStoreFull, ValueError) as e:
+            ui.notification_show(f"Could not load the workout data: {e}", type="error", duration=None)
+            return
+        release_held()
+        held.append(dataset)
+        shown.set(dataset)
+
+    @reactive.calc
+    @stage
+    def parse_data() -> WorkoutStore:
+        dataset = shown()
+        req(dataset is not None)
+        return dataset.store
 
     @reactive.calc
-    def parse_exercise() -> pd.DataFrame:
-        workout_data = parse_data()
-        selected_exercise = workout_data[workout_data['Exercise Name'] == input.exercise()]
-        return selected_exercise
+    @stage
+    def exercise_analysis() -> dict:
+        # One pass per (exercise, date range) for every exercise output: the daily
+        # 1RM series and the stats (from the aggregates' prefix sums)
+        aggregates = parse_data().aggregates
+        exercise = input.exercise()
+        start_date, end_date = input.date_range()
+        with span("filter"):
+            daily_max = aggregates.daily_max(exercise, start_date, end_date)
+            return {
+                "daily_max": daily_max.rename(columns={'day': 'Date', 'max_1rm': '1_Rep_Max'}),
+                "stats": aggregates.exercise_stats(exercise, start_date, end_date),
+            }
+
+    @reactive.calc
+    @stage
+    def volume_analysis() -> pd.DataFrame:
+        start_date, end_date = input.date_range()
+        aggregates = parse_data().aggregates
+        with span("filter"):
+            daily_volume = aggregates.volume(start_date, end_date).rename(columns={'day': 'Date', 'volume': 'Volume'})
+            daily_volume['Average_Volume'] = aggregates.volume_stats(start_date, end_date)['average_volume']
+            daily_volume['Color'] = np.where(daily_volume['Volume'] < daily_volume['Average_Volume'], 'Below Average', 'Above Average')
+            return daily_volume
+
+    @reactive.calc
+    @stage
+    def load_analysis() -> dict:
+        # The load series are built once per dataset; a date range only slices them
+        start_date, end_date = input.date_range()
+        load = parse_data().training_load
+        exercise = input.exercise()
+        with span("filter"):
+            return {
+                "daily": load.series(start_date, end_date).rename(columns={
+                    'day': 'Date', 'acute': 'Acute (7d)', 'chronic': 'Chronic (28d)',
+                    'fitness': 'Fitness', 'fatigue': 'Fatigue', 'acwr': 'ACWR'}),
+                "weekly": load.weekly_tonnage(start_date, end_date),
+                "latest": load.latest(end_date),
+                "trend": load.trend(exercise, start_date, end_date),
+            }
+
+    @reactive.calc
+    @stage
+    def lift_prs() -> dict[str, float]:
+        return parse_data().lifts.max_weights()
+
+    # Start cursor of each page up to the one shown (keyset pagination, see api.set_table)
+    table_cursors = reactive.value([None])
+
+    # Runs before the outputs, so the table never shows an old cursor against a new selection
+    @reactive.effect(priority=1)
+    @reactive.event(input.exercise, parse_data, input.date_range)
+    def reset_table_page():
+        table_cursors.set([None])
+
+    @reactive.effect
+    @reactive.event(input.table_next)
+    def next_table_page():
+        cursor = table_page()["next_cursor"]
+        if cursor is not None:
+            table_cursors.set([*table_cursors(), cursor])
+
+    @reactive.effect
+    @reactive.event(input.table_prev)
+    def previous_table_page():
+        if len(table_cursors()) > 1:
+            table_cursors.set(table_cursors()[:-1])
+
+    @reactive.calc
+    @stage
+    def table_page() -> dict:
+        start_date, end_date = input.date_range()
+        return set_page(parse_data(), input.exercise(), start_date, end_date,
+                        limit=TABLE_PAGE_ROWS, cursor=table_cursors()[-1])
+
+    @render.ui
+    def table_range():
+        page = table_page()
+        first = (len(table_cursors()) - 1) * TABLE_PAGE_ROWS
+        if not page["total"]:
+            return ui.markdown("<p style='text-align: center;'>No sets in this range</p>")
+        return ui.markdown(f"<p style='text-align: center;'>Sets {first + 1}-{first + len(page['rows'])} of {page['total']}</p>")
 
     @render.data_frame
-    @reactive.event(input.exercise,input.file_input, input.analysis, input.date_range)
+    @reactive.event(input.exercise,parse_data, input.analysis, input.date_range, table_cursors)
     def show_data():
         if input.analysis() == "1":
-            selected_exercise = parse_exercise().copy()
-            selected_exercise['Date_dt'] = pd.to_datetime(selected_exercise['Date'])
-            selected_exercise['Date_dt'] = selected_exercise['Date_dt'].dt.date
-            # selected_exercise['Date_dt'] = selected_exercise['Date'].dt.date
-
-            # Filter the data for the specified date range
-            start_date, end_date = input.date_range()
-            mask = (selected_exercise['Date_dt'] >= start_date) & (selected_exercise['Date_dt'] <= end_date)
-            selected_exercise = selected_exercise.loc[mask]
-            selected_exercise = selected_exercise[['Date','Set Order','Weight','Reps']]
-
+            rows = table_page()["rows"]
+            with span("serialise"):
+                selected_exercise = rows.assign(Date=rows['Date'].astype(str))
             return render.DataGrid(selected_exercise, width="100%",height="100%", selection_mode="none",)
+        if input.analysis() == "3":
+            weekly = load_analysis()["weekly"]
+            with span("serialise"):
+                weekly = pd.DataFrame({
+                    'Week Of': weekly['week'].dt.strftime('%Y-%m-%d'),
+                    'Tonnage': weekly['volume'].round(2),
+                    'Sets': weekly['sets'].astype(int),
+                    'Training Days': weekly['days'],
+                })
+            return render.DataGrid(weekly, width="100%",height="100%", selection_mode="none",)
 
     @render.ui
-    @reactive.event(input.exercise,input.file_input, input.analysis)
+    @reactive.event(input.exercise,parse_data, input.analysis)
     def data_title():
         if input.analysis() == "1":
             return ui.markdown(f"<h2 style='text-align: center;'>{input.exercise()} Data</h2>")
+        if input.analysis() == "3":
+            return ui.markdown("<h2 style='text-align: center;'>Weekly Tonnage</h2>")
     @render.ui
     def show_exercises():
-        exercises_update = parse_data().copy()['Exercise Name'].tolist()
-        exercises_update.sort()
+        exercises_update = parse_data().exercises.tolist()
         return ui.input_selectize("exercise","Exercise for 1 Rep Analysis", exercises_update, selected=f"{exercises_update[0]}"), #Make reactive
 
     @render.ui
-    @reactive.event(input.exercise,input.file_input)
+    @reactive.event(input.exercise,parse_data)
     def count_sets_reps():
-        selected_exercise = parse_exercise()
-        count_sets = len(selected_exercise)
-        count_reps = selected_exercise['Reps'].sum()
+        totals = parse_data().aggregates.exercise_stats(input.exercise())
+        count_sets = totals['sets']
+        count_reps = totals['reps']
         return ui.markdown(f"<p style='text-align: center;'>Total # of Sets {count_sets}, Total # of Reps {count_reps}</p>")
 
     @render.ui
-    @reactive.event(input.exercise,input.file_input,input.analysis)
+    @reactive.event(input.exercise,parse_data,input.analysis)
     def plot_title():
         if input.analysis() == "1":
             return ui.markdown(f"<h2 style='text-align: center;'>{input.exercise()} Predicted 1 Rep Max Over Time Period</h2>")
+        elif input.analysis() == "2":
+            return ui.markdown("<h2 style='text-align: center;'>Workout Volume Compared to Average Volume Over Time Period</h2>")
         else:
-            return ui.markdown(f"<h2 style='text-align: center;'>Workout Volume Compared to Average Volume Over Time Period</h2>")
+            return ui.markdown("<h2 style='text-align: center;'>Training Load Over Time Period</h2>")
 
-    @render.plot
-    @reactive.event(input.exercise,input.file_input,input.analysis, input.date_range)
-    def plot_exercise():
-        if input.analysis() == "1":
-            return plot_1_rep_max()
-        else:
-            return plot_workout_volume()
-        
     @reactive.calc
-    def plot_1_rep_max():
-        selected_exercise = parse_exercise().copy()
-        selected_exercise['Date'] = pd.to_datetime(selected_exercise['Date'])
-        selected_exercise['Date_dt'] = selected_exercise['Date'].dt.date
-        selected_exercise['1_Rep_Max'] = (selected_exercise['Weight'] * selected_exercise['Reps'] / 30) + selected_exercise['Weight']
-        
-        # Filter the data for the specified date range
+    def chart_points() -> int:
+        # The browser doesn't enforce the field's min, so clamp it here
+        return max(MIN_POINTS, int(input.max_points() or DEFAULT_CHART_POINTS))
+
+    @render.image
+    @reactive.event(input.exercise, parse_data, input.analysis, input.date_range, chart_points,
+                    lambda: session.clientdata.output_width("plot_exercise"),
+                    lambda: session.clientdata.output_height("plot_exercise"))
+    async def plot_exercise():
+        analysis = input.analysis()
         start_date, end_date = input.date_range()
-        mask = (selected_exercise['Date_dt'] >= start_date) & (selected_exercise['Date_dt'] <= end_date)
-        selected_exercise = selected_exercise.loc[mask]
-        
-        daily_max = selected_exercise.groupby('Date')['1_Rep_Max'].max().reset_index()
-        
-        plot = (ggplot(daily_max, aes(x='Date', y='1_Rep_Max')) 
-            + geom_line()
-            + geom_point(aes(size='1_Rep_Max'), alpha=0.6)
-            + scale_x_datetime(date_breaks='1 month', date_labels='%b %Y')
-            + theme(axis_text_x=element_text(angle=45)) 
-            + labs(x='Date', y='1 Rep Max')
-            )  
-        return plot
-    
+        width = session.clientdata.output_width("plot_exercise")
+        height = session.clientdata.output_height("plot_exercise")
+        req(width, height)
+        pixelratio = session.clientdata.pixelratio()
+        key = (shown().dataset_id, analysis, input.exercise() if analysis == "1" else None,
+               str(start_date), str(end_date), chart_points(), width, height, pixelratio)
+        data = {"1": plot_1_rep_max, "2": plot_workout_volume, "3": plot_training_load}[analysis]()
+        with span("render"):
+            src = await chart_cache.get(key, analysis, data, width, height, pixelratio)
+        return {"src": src, "width": "100%", "height": "100%"}
+
     @reactive.calc
-    def plot_workout_volume():
-        workout_data = parse_data().copy()
-        workout_data['Date'] = pd.to_datetime(workout_data['Date'])
-        workout_data['Date_dt'] = workout_data['Date'].dt.date
-        
-        start_date, end_date = input.date_range()
-        mask = (workout_data['Date_dt'] >= start_date) & (workout_data['Date_dt'] <= end_date)
-        workout_data = workout_data.loc[mask]
-        
-        workout_data['Volume'] = workout_data['Weight'] * workout_data['Reps']
-        daily_volume = workout_data.groupby('Date')['Volume'].sum().reset_index()
-        daily_volume['Average_Volume'] = daily_volume['Volume'].mean()
-        daily_volume['Color'] = np.where(daily_volume['Volume'] < daily_volume['Average_Volume'], 'Below Average', 'Above Average')
-        
-        plot = (ggplot(daily_volume, aes(x='Date', y='Volume')) 
-            + geom_line()
-            + geom_line(aes(y='Average_Volume'), color='teal', linetype='dashed')
-            + geom_point(aes(size='Volume', color='Color'), alpha=0.6)
-            + scale_x_datetime(date_breaks='1 month', date_labels='%b %Y')
-            + theme(axis_text_x=element_text(angle=45)) 
-            + labs(x='Date', y='Volume')
-            )  
-        return plot
+    def plot_1_rep_max() -> pd.DataFrame:
+        return downsample(exercise_analysis()["daily_max"], 'Date', '1_Rep_Max', chart_points())
 
+    @reactive.calc
+    def plot_workout_volume() -> pd.DataFrame:
+        return downsample(volume_analysis(), 'Date', 'Volume', chart_points())
 
-    @render.text
-    def Bench_pr():
-        data = parse_data().copy()
-        bench_max = data[data['Exercise Name'].str.contains('Bench Press')]['Weight'].max()
-        return f"Bench: {bench_max:.2f} lbs"
+    @reactive.calc
+    def plot_training_load() -> pd.DataFrame:
+        return downsample(load_analysis()["daily"], 'Date', 'volume', chart_points())
 
-    @render.text
-    def Deadlift_pr():
-        data = parse_data().copy()
-        deadlift_max = data[data['Exercise Name'].str.contains('Deadlift')]['Weight'].max()
-        return f"Deadlift: {deadlift_max:.2f} lbs"
 
-    @render.text
-    def Squat_pr():
-        data = parse_data().copy()
-        squat_max = data[data['Exercise Name'].str.contains('Squat')]['Weight'].max()
-        return f"Squat: {squat_max:.2f} lbs"
+    @render.ui
+    def lift_pr_boxes():
+        # One box per configured lift group (LIFT_METRICS_LIFT_GROUPS), not a fixed three
+        themes = ("green", "blue", "red")
+        return ui.layout_column_wrap(
+            *[
+                ui.value_box("", f"{group.title()}: {weight:.2f} lbs", showcase=award_icon, theme=themes[i % len(themes)])
+                for i, (group, weight) in enumerate(lift_prs().items())
+            ],
+            fill=True,
+        )
 
     @render.ui
     def pr_text():
@@ -247,57 +387,33 @@ def server(input, output, session):
         return ui.markdown("<br>")
 
     @render.ui
-    @reactive.event(input.analysis, input.exercise, input.file_input)
+    @reactive.event(input.analysis, input.exercise, parse_data)
     def time_period():
         if (input.analysis() == "1"):
-            exercises = parse_exercise().copy()
-            exercises['Date'] = pd.to_datetime(exercises['Date'])
-            first_date = exercises['Date'].min()
-            last_date = exercises['Date'].max()
-            return ui.input_date_range("date_range", "Select Time Period", start=first_date, end=last_date, min=first_date, max=last_date+pd.DateOffset(days=1))
+            first_date, last_date = parse_data().date_bounds(input.exercise())
         else:
-            data = parse_data().copy()
-            data['Date'] = pd.to_datetime(data['Date'])
-            first_date = data['Date'].min()
-            last_date = data['Date'].max()
-            return ui.input_date_range("date_range", "Select Time Period", start=first_date, end=last_date, min=first_date, max=last_date+pd.DateOffset(days=1))
+            first_date, last_date = parse_data().date_bounds()
+        return ui.input_date_range("date_range", "Select Time Period", start=first_date, end=last_date, min=first_date, max=last_date+pd.DateOffset(days=1))
 
     @render.text
-    @reactive.event(input.exercise, input.file_input, input.date_range, input.analysis)
+    @reactive.event(input.exercise, parse_data, input.date_range, input.analysis)
     def best_pr():
         if input.analysis() == "1":
-            exercise = parse_exercise().copy()
-            exercise['Data_dt'] = pd.to_datetime(exercise['Date']).dt.date
-            start_date, end_date = input.date_range()
-            mask = (exercise['Data_dt'] >= start_date) & (exercise['Data_dt'] <= end_date)
-            exercise = exercise.loc[mask]
-            exercise_max = exercise['Weight'].max()
+            exercise_max = exercise_analysis()['stats']['best_pr']
             return f"Exercise Best: {exercise_max:.2f} lbs"
 
     @render.text
-    @reactive.event(input.exercise, input.file_input, input.date_range, input.analysis)
+    @reactive.event(input.exercise, parse_data, input.date_range, input.analysis)
     def average_volume():
         if input.analysis() == "1":
-            exercise = parse_exercise().copy()
-            exercise['Data_dt'] = pd.to_datetime(exercise['Date']).dt.date
-            start_date, end_date = input.date_range()
-            mask = (exercise['Data_dt'] >= start_date) & (exercise['Data_dt'] <= end_date)
-            exercise = exercise.loc[mask]
-            exercise['Volume'] = exercise['Weight'] * exercise['Reps']
-            average_volume = exercise['Volume'].mean()
+            average_volume = exercise_analysis()['stats']['average_volume']
             return f"Average Volume: {average_volume:.2f} lbs"
 
     @render.text
-    @reactive.event(input.exercise, input.file_input, input.date_range, input.analysis)
+    @reactive.event(input.exercise, parse_data, input.date_range, input.analysis)
     def total_volume():
         if input.analysis() == "1":
-            exercise = parse_exercise().copy()
-            exercise['Data_dt'] = pd.to_datetime(exercise['Date']).dt.date
-            start_date, end_date = input.date_range()
-            mask = (exercise['Data_dt'] >= start_date) & (exercise['Data_dt'] <= end_date)
-            exercise = exercise.loc[mask]
-            exercise['Volume'] = exercise['Weight'] * exercise['Reps']
-            total_volume = exercise['Volume'].sum()
+            total_volume = exercise_analysis()['stats']['total_volume']
             return f"Total Volume: {total_volume:.2f} lbs"
 
     @render.ui
@@ -322,5 +438,66 @@ def server(input, output, session):
                         ),
                         fill=True,
                     )
-    
-app = App(app_ui, server)
\ No newline at end of file
+        if input.analysis() == "3":
+            return ui.layout_column_wrap(
+                        ui.value_box(
+                            "",
+                            ui.output_text("load_acwr"),
+                            theme="yellow",
+                        ),
+                        ui.value_box(
+                            "",
+                            ui.output_text("load_form"),
+                            theme="orange",
+                        ),
+                        ui.value_box(
+                            "",
+                            ui.output_text("load_trend"),
+                            theme="purple",
+                        ),
+                        fill=True,
+                    )
+
+    @render.text
+    @reactive.event(parse_data, input.date_range, input.analysis)
+    def load_acwr():
+        if input.analysis() == "3":
+            acwr = load_analysis()['latest']['acwr']
+            return "Acute:Chronic Ratio: n/a" if acwr is None else f"Acute:Chronic Ratio: {acwr:.2f}"
+
+    @render.text
+    @reactive.event(parse_data, input.date_range, input.analysis)
+    def load_form():
+        if input.analysis() == "3":
+            form = load_analysis()['latest']['form']
+            return "Form: n/a" if form is None else f"Form (Fitness - Fatigue): {form:.0f}"
+
+    @render.text
+    @reactive.event(input.exercise, parse_data, input.date_range, input.analysis)
+    def load_trend():
+        if input.analysis() == "3":
+            trend = load_analysis()['trend']
+            slope = trend['slope_per_week'].iloc[-1] if len(trend) else np.nan
+            if np.isnan(slope):
+                return f"{input.exercise()} 1RM Trend: n/a"
+            return f"{input.exercise()} 1RM Trend: {slope:+.2f} lbs/week"
+
+shiny_app = App(app_ui, server)
+
+
+async def app(scope, receive, send):
+    """The Shiny app, plus its stage, dataset and chart-cache metrics at /api/metrics (Prometheus text)."""
+    if scope["type"] == "http" and scope["path"] == "/api/metrics":
+        stored, charts = shared_datasets.stats(), chart_cache.stats()
+        gauges = {
+            "lift_metrics_datasets": ("Parsed datasets shared by sessions.", stored["entries"]),
+            "lift_metrics_dataset_bytes": ("Memory held by parsed datasets.", stored["bytes"]),
+            "lift_metrics_chart_cache_entries": ("Rendered charts cached.", charts["entries"]),
+        }
+        counters = {
+            "lift_metrics_chart_cache_hits_total": ("Chart requests served from the cache.", charts["hits"]),
+            "lift_metrics_chart_cache_misses_total": ("Chart requests that rendered.", charts["misses"]),
+        }
+        response = PlainTextResponse(metrics.exposition(gauges, counters), media_type="text/plain; version=0.0.4")
+        return await response(scope, receive, send)
+    await shiny_app(scope, receive, send)
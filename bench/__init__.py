@@ -0,0 +1 @@
+"""Benchmarks and synthetic data for the analysis paths (see bench/run.py)."""
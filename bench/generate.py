@@ -0,0 +1,178 @@
+"""
+Seeded synthetic Strong exports.
+
+Writes a Strong-format CSV with a given number of sets: workouts on a
+rotating split spread over a fixed span of years (so larger files mean more
+frequent sessions, up to several a day, rather than centuries of history),
+4-6 exercises per session drawn from
+the split's pool, 2-5 working sets per exercise plus the odd warm-up (W) or
+drop (D) set, and loads that progress week over week with deloads, noise and
+plate rounding. Rows are generated column-wise with NumPy in chunks of
+workouts, so memory stays flat up to 10M+ sets (writing the CSV dominates the
+time). The same seed always produces the same file.
+
+    python -m bench.generate --sets 1000000 --seed 7 -o bench/.data/strong_1m.csv
+"""
+import argparse
+import math
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Split name -> (exercise, starting weight in lbs, plate step); 0 weight means bodyweight.
+SPLITS = {
+    "Upper 1": [
+        ("Bench Press (Barbell)", 135, 5), ("Bent Over Row (Barbell)", 115, 5), ("Dumbbell Seated Shoulder Press", 35, 5),
+        ("Lat Pulldown (Cable)", 100, 5), ("Incline Bench Press (Dumbbell)", 45, 5), ("Hammer Curl (Dumbbell)", 25, 5),
+        ("Tricep Pushdown (V-attachment)", 40, 5),
+    ],
+    "Lower 1": [
+        ("Squat (Barbell)", 155, 5), ("Romanian Deadlift (Dumbbell)", 50, 5), ("Leg Extension (Machine)", 80, 5),
+        ("Seated Leg Curl (Machine)", 70, 5), ("Hip Adductor (Machine)", 90, 5), ("Standing Calf Raise (Machine)", 100, 10),
+    ],
+    "Upper 2": [
+        ("Incline Bench Press (Barbell)", 115, 5), ("Pull Up", 0, 5), ("Shoulder Press (Machine)", 70, 5),
+        ("Chest Supported Machine Row", 90, 5), ("Lateral Raise (Dumbbell)", 15, 5), ("Bicep Curl (Barbell)", 50, 5),
+        ("Chest Dip", 0, 5), ("Overhead Cable Tricep Extensions", 30, 5),
+    ],
+    "Lower 2": [
+        ("Deadlift (Barbell)", 185, 5), ("Front Squat (Barbell)", 115, 5), ("Bulgarian Split Squat", 30, 5),
+        ("Lying Leg Curl (Machine)", 60, 5), ("Leg Press", 200, 10), ("Hip Thrust (Barbell)", 135, 10),
+    ],
+}
+COLUMNS = ["Date", "Workout Name", "Duration", "Exercise Name", "Set Order", "Weight", "Reps", "Distance", "Seconds", "RPE"]
+MEAN_SETS_PER_WORKOUT = 18.1  # 4-6 exercises x (2-5 working sets + occasional W/D)
+CHUNK_WORKOUTS = 20_000  # generated and written per chunk, bounding memory at any size
+WEEKLY_GAIN = 0.004  # fractional load increase per week
+DELOAD_EVERY = 8  # weeks
+
+
+def _schedule(n_workouts: int, rng: np.random.Generator, start: str, years: float) -> np.ndarray:
+    """Sorted workout timestamps over `years` from `start`, at varied times of day."""
+    span = max(int(years * 365.25), 1)
+    days = np.datetime64(start, "D") + np.sort(rng.integers(0, span, size=n_workouts)).astype("timedelta64[D]")
+    seconds = np.sort(rng.integers(6 * 3600, 21 * 3600, size=n_workouts)).astype("timedelta64[s]")
+    stamps = days.astype("datetime64[s]") + rng.permutation(seconds)
+    return np.sort(stamps)
+
+
+def _workouts(dates: np.ndarray, first: int, origin: np.datetime64, rng: np.random.Generator) -> pd.DataFrame:
+    """Set rows for the workouts at `dates` (global workout numbers from `first`)."""
+    n_workouts = len(dates)
+    split_names = list(SPLITS)
+    split = (first + np.arange(n_workouts)) % len(split_names)
+
+    # Exercises per workout: a random 4-6 from the split's pool, in pool order.
+    pool_size = np.array([len(SPLITS[s]) for s in split_names])
+    n_ex = rng.integers(4, 7, size=n_workouts)
+    scores = rng.random((n_workouts, pool_size.max()))
+    scores[np.arange(pool_size.max()) >= pool_size[split][:, None]] = np.inf
+    ranks = np.argsort(np.argsort(scores, axis=1), axis=1)
+    chosen = ranks < n_ex[:, None]
+    workout_of, slot = np.nonzero(chosen)
+
+    catalog = [(s, *e) for s in split_names for e in SPLITS[s]]
+    offsets = np.concatenate([[0], np.cumsum(pool_size)])
+    exercise = offsets[split[workout_of]] + slot
+    names = np.array([c[1] for c in catalog], dtype=object)
+    base = np.array([c[2] for c in catalog], dtype=np.float64)
+    step = np.array([c[3] for c in catalog], dtype=np.float64)
+
+    # Sets per exercise: 2-5 working sets, sometimes a warm-up first or a drop set last.
+    working = rng.integers(2, 6, size=len(exercise))
+    warmup = rng.random(len(exercise)) < 0.08
+    drop = rng.random(len(exercise)) < 0.04
+    per_exercise = working + warmup + drop
+    row_ex = np.repeat(np.arange(len(exercise)), per_exercise)
+    position = np.arange(len(row_ex)) - np.repeat(np.cumsum(per_exercise) - per_exercise, per_exercise)
+    is_warmup = warmup[row_ex] & (position == 0)
+    is_drop = drop[row_ex] & (position == per_exercise[row_ex] - 1)
+    set_number = position + 1 - warmup[row_ex]
+    set_order = np.where(is_warmup, "W", np.where(is_drop, "D", set_number.astype(str)))
+
+    # Load: linear weekly progression, a deload every few weeks, per-set noise.
+    workout = workout_of[row_ex]
+    ex = exercise[row_ex]
+    weeks = (dates[workout] - origin).astype("timedelta64[D]").astype(np.int64) / 7
+    deload = np.where((weeks.astype(np.int64) % DELOAD_EVERY) == DELOAD_EVERY - 1, 0.85, 1.0)
+    # Progress flattens over the years: gains on log time rather than linear.
+    progress = 1 + WEEKLY_GAIN * 52 * np.log1p(weeks / 52)
+    intensity = rng.normal(1.0, 0.04, size=len(row_ex)) * deload * progress
+    intensity = np.where(is_warmup, 0.5, np.where(is_drop, 0.7, 1.0)) * intensity
+    weight = np.round(base[ex] * intensity / step[ex]) * step[ex]
+    reps = np.clip(np.round(rng.normal(9, 2.5, size=len(row_ex)) / np.sqrt(intensity)), 1, 20)
+    reps = np.where(is_warmup, 12, reps)
+    rpe = np.where(rng.random(len(row_ex)) < 0.15, np.clip(np.round(rng.normal(8, 1, len(row_ex)) * 2) / 2, 5, 10), np.nan)
+
+    duration = rng.integers(35, 95, size=n_workouts)
+    frame = pd.DataFrame({
+        "Date": pd.to_datetime(dates[workout]).strftime("%Y-%m-%d %H:%M:%S"),
+        "Workout Name": np.array(split_names, dtype=object)[split[workout]],
+        "Duration": pd.Series(duration[workout]).astype(str).to_numpy() + "m",
+        "Exercise Name": names[ex],
+        "Set Order": set_order,
+        "Weight": weight,
+        "Reps": reps,
+        "Distance": 0,
+        "Seconds": 0.0,
+        "RPE": rpe,
+    }, columns=COLUMNS)
+    return frame
+
+
+def generate_chunks(n_sets: int, seed: int = 0, start: str = "2015-01-05", years: float = 10) -> Iterator[pd.DataFrame]:
+    """An export of exactly `n_sets` rows, as consecutive row chunks."""
+    # A few percent of spare workouts so the sets always run out before the schedule does.
+    n_workouts = math.ceil(n_sets / MEAN_SETS_PER_WORKOUT * 1.05) + 8
+    dates = _schedule(n_workouts, np.random.default_rng(seed), start, years)
+    remaining = n_sets
+    for i, first in enumerate(range(0, n_workouts, CHUNK_WORKOUTS)):
+        frame = _workouts(dates[first:first + CHUNK_WORKOUTS], first, dates[0], np.random.default_rng([seed, i]))
+        frame = frame.iloc[:remaining]
+        remaining -= len(frame)
+        yield frame
+        if not remaining:
+            return
+    raise RuntimeError(f"schedule ran out {remaining} sets short")
+
+
+def generate(n_sets: int, seed: int = 0, start: str = "2015-01-05", years: float = 10) -> pd.DataFrame:
+    """A Strong export with exactly `n_sets` rows."""
+    return pd.concat(generate_chunks(n_sets, seed, start, years), ignore_index=True)
+
+
+def write(path: str | Path, n_sets: int, seed: int = 0, years: float = 10) -> Path:
+    """Generate and write an export chunk by chunk; returns the path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        for i, chunk in enumerate(generate_chunks(n_sets, seed, years=years)):
+            chunk.to_csv(f, index=False, header=i == 0)
+    return path
+
+
+def parse_count(text: str) -> int:
+    """'10k', '2.5M' or '10000' -> int."""
+    text = text.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.generate", description="Write a synthetic Strong export.")
+    parser.add_argument("--sets", type=parse_count, default=100_000, help="number of sets, e.g. 10k or 10M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=float, default=10, help="span of training history")
+    parser.add_argument("-o", "--output", default=None, help="CSV path (default: bench/.data/strong_<sets>_<seed>.csv)")
+    args = parser.parse_args(argv)
+    output = args.output or Path(__file__).parent / ".data" / f"strong_{args.sets}_{args.seed}.csv"
+    started = time.perf_counter()
+    path = write(output, args.sets, args.seed, args.years)
+    print(f"{path}: {args.sets} sets in {time.perf_counter() - started:.1f}s ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Benchmark harness for the analysis paths.
+
+For each export size (synthetic, from bench.generate, cached under
+bench/.data/) it times:
+
+- ingest: `ingest_export` (chunked read, parse_workout_df, sort and index);
+- derived: building the store's daily aggregates, lift index and training load;
+- api: every analysis endpoint through the ASGI app in-process (httpx);
+- shiny: the Shiny app's render functions end to end, by driving a session
+  over its websocket in-process and timing each input change until the
+  session's outputs are flushed.
+
+Each case runs in a fresh process so its peak RSS is its own. Results
+(iterations, mean/p50/p99 latency, sets per second at p50, peak RSS) go to a
+JSON file; `--compare` checks a run against a saved baseline and exits 1 when
+any p50 latency or peak RSS regressed beyond the tolerance.
+
+    python -m bench.run --sizes 10k,100k --save bench/baseline.json
+    python -m bench.run --sizes 10k,100k --compare bench/baseline.json
+
+The engine, render pool and disk cache default to in-process and off
+(LIFT_METRICS_ENGINE_WORKERS=0, LIFT_METRICS_RENDER_WORKERS=0,
+LIFT_METRICS_CACHE_DIR=off) so timings and RSS cover the work itself; set
+them in the environment to benchmark other configurations.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from bench.generate import parse_count, write
+
+DATA_DIR = Path(__file__).parent / ".data"
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_ITERATIONS = 20
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR_MS = 1.0  # latency changes smaller than this are never regressions
+ENV_DEFAULTS = {"LIFT_METRICS_ENGINE_WORKERS": "0", "LIFT_METRICS_RENDER_WORKERS": "0", "LIFT_METRICS_CACHE_DIR": "off"}
+SHINY_OUTPUTS = [
+    "show_exercises", "count_sets_reps", "time_period", "lift_pr_boxes", "plot_title",
+    "plot_exercise", "plot_stats", "show_data", "data_title", "best_pr", "average_volume", "total_volume",
+    "load_acwr", "load_form", "load_trend",
+]
+
+
+def _label(n_sets: int) -> str:
+    for unit, scale in (("m", 1_000_000), ("k", 1_000)):
+        if n_sets >= scale and n_sets % scale == 0:
+            return f"{n_sets // scale}{unit}"
+    return str(n_sets)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def _timed(samples: dict[str, list[float]], name: str, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+    return result
+
+
+async def _timed_async(samples: dict[str, list[float]], name: str, awaitable):
+    started = time.perf_counter()
+    result = await awaitable
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+    return result
+
+
+# Cases: each runs in its own process and returns {name: [seconds, ...]}. ------
+
+def case_ingest(path: str, iterations: int) -> dict[str, list[float]]:
+    from api.ingest import ingest_export
+
+    samples = {}
+    for _ in range(iterations):
+        _timed(samples, "ingest", ingest_export, path)
+    return samples
+
+
+def case_derived(path: str, iterations: int) -> dict[str, list[float]]:
+    from api.ingest import ingest_export
+    from api.store import WorkoutStore
+
+    store = ingest_export(path).store
+    samples = {}
+    for _ in range(iterations):
+        fresh = WorkoutStore.from_columns(store.columns(), store.exercises)  # no cached derived data
+        _timed(samples, "aggregates", lambda: fresh.aggregates)
+        _timed(samples, "lifts", lambda: fresh.lifts)
+        _timed(samples, "training_load", lambda: fresh.training_load)
+    return samples
+
+
+def case_api(path: str, iterations: int) -> dict[str, list[float]]:
+    return asyncio.run(_api(path, iterations))
+
+
+async def _api(path: str, iterations: int) -> dict[str, list[float]]:
+    import httpx
+
+    from api.main import app
+
+    export = Path(path).read_bytes()
+    samples = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def call(name: str, method: str, url: str, **kwargs) -> dict:
+            response = await _timed_async(samples, name, client.request(method, url, **kwargs))
+            response.raise_for_status()
+            return response.json()
+
+        for i in range(iterations):
+            # Trailing blank lines change the content hash but not the parse, so every upload is a cold parse.
+            upload = await call("upload", "POST", "/api/upload", files={"file": ("bench.csv", export + b"\n" * (i + 1), "text/csv")})
+        dataset_id = upload["dataset_id"]
+        start, end = upload["date_range"]["min"][:10], upload["date_range"]["max"][:10]
+        exercise = max(upload["exercise_totals"], key=lambda e: upload["exercise_totals"][e]["sets"])
+        top = sorted(upload["exercise_totals"], key=lambda e: -upload["exercise_totals"][e]["sets"])[:5]
+        await call("team_register", "POST", "/api/teams/bench/athletes", data={"athlete_id": "a", "dataset_id": dataset_id, "bodyweight": 180})
+
+        requests = {
+            "1rm": ("POST", "/api/analysis/1rm", {"json": {"dataset_id": dataset_id, "exercise": exercise, "start_date": start, "end_date": end, "max_points": 500}}),
+            "1rm_batch": ("POST", "/api/analysis/1rm/batch", {"json": {"dataset_id": dataset_id, "exercises": top, "formulas": ["epley", "brzycki"], "max_points": 500}}),
+            "volume": ("POST", "/api/analysis/volume", {"json": {"dataset_id": dataset_id, "start_date": start, "end_date": end, "max_points": 500}}),
+            "load": ("POST", "/api/analysis/load", {"json": {"dataset_id": dataset_id, "exercise": exercise, "max_points": 500}}),
+            "sets": ("GET", "/api/sets", {"params": {"dataset_id": dataset_id, "exercise": exercise, "sort": "e1rm", "order": "desc", "limit": 100}}),
+            "prs": ("GET", "/api/prs", {"params": {"dataset_id": dataset_id}}),
+            "team_leaderboard": ("GET", "/api/teams/bench/leaderboard", {"params": {"group": "bench"}}),
+            "team_volume": ("GET", "/api/teams/bench/volume", {"params": {"start_date": start, "end_date": end}}),
+        }
+        for name, (method, url, kwargs) in requests.items():
+            await client.request(method, url, **kwargs)  # warm-up: builds lazily derived data once
+            for _ in range(iterations):
+                await call(name, method, url, **kwargs)
+    samples.pop("team_register")
+    return samples
+
+
+def case_shiny(path: str, iterations: int) -> dict[str, list[float]]:
+    os.environ["LIFT_METRICS_DEFAULT_CSV"] = path
+    from starlette.testclient import TestClient
+
+    import app as shiny_app
+    from api.ingest import ingest_export
+
+    store = ingest_export(path).store
+    exercise = store.exercises[int(np.argmax(np.diff(store.offsets)))]
+    first, last = (str(d.date()) for d in store.date_bounds())
+    client_data = {
+        "file_input": None, "analysis": "1", "max_points": 400,
+        ".clientdata_output_plot_exercise_width": 800, ".clientdata_output_plot_exercise_height": 400,
+        ".clientdata_pixelratio": 1, ".clientdata_url_protocol": "http:", ".clientdata_url_hostname": "bench",
+        ".clientdata_url_port": "", ".clientdata_url_pathname": "/", ".clientdata_url_search": "",
+        ".clientdata_url_hash_initial": "", ".clientdata_url_hash": "", ".clientdata_singletons": "",
+        **{f".clientdata_output_{name}_hidden": False for name in SHINY_OUTPUTS},
+    }
+    samples = {}
+    with TestClient(shiny_app.app) as http:
+        for i in range(iterations):
+            with http.websocket_connect("/websocket/") as ws:
+                def flush(message: dict) -> None:
+                    """Send an input change and wait for the session's outputs."""
+                    ws.send_text(json.dumps(message))
+                    idle = False
+                    while True:
+                        reply = json.loads(ws.receive_text())
+                        if reply.get("busy") == "idle":
+                            idle = True
+                        elif idle and "values" in reply:
+                            return
+
+                _timed(samples, "session_start", flush, {"method": "init", "data": client_data})
+                # A different range each iteration, so charts are rendered rather than served from the cache.
+                date_range = {"date_range:shiny.date": [first, str(np.datetime64(last) - np.timedelta64(i, "D"))]}
+                _timed(samples, "1rm", flush, {"method": "update", "data": {"exercise": exercise, **date_range}})
+                _timed(samples, "volume", flush, {"method": "update", "data": {"analysis": "2"}})
+                _timed(samples, "load", flush, {"method": "update", "data": {"analysis": "3"}})
+    return samples
+
+
+CASES = {"ingest": case_ingest, "derived": case_derived, "api": case_api, "shiny": case_shiny}
+
+
+def _run_case(case: str, path: str, iterations: int) -> tuple[dict[str, list[float]], float]:
+    for name, value in ENV_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    samples = CASES[case](path, iterations)
+    return samples, _peak_rss_mb()
+
+
+def _stats(seconds: list[float], n_sets: int, peak_rss_mb: float) -> dict:
+    ms = np.asarray(seconds) * 1000
+    p50 = float(np.percentile(ms, 50))
+    return {
+        "iterations": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": p50,
+        "p99_ms": float(np.percentile(ms, 99)),
+        "sets_per_s": n_sets / (p50 / 1000) if p50 > 0 else None,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def run(sizes: list[int], cases: list[str], iterations: int, seed: int = 0) -> dict:
+    results = {}
+    for n_sets in sizes:
+        path = DATA_DIR / f"strong_{n_sets}_{seed}.csv"
+        if not path.exists():
+            print(f"generating {path.name} ...", file=sys.stderr)
+            write(path, n_sets, seed)
+        for case in cases:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                samples, peak = pool.submit(_run_case, case, str(path), iterations).result()
+            for name, seconds in samples.items():
+                key = f"{_label(n_sets)}/{case}/{name}"
+                results[key] = _stats(seconds, n_sets, peak)
+                print(_format_row(key, results[key]), file=sys.stderr)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": __import__("pandas").__version__,
+            "seed": seed,
+            "env": {name: os.environ.get(name, value) for name, value in ENV_DEFAULTS.items()},
+        },
+        "results": results,
+    }
+
+
+def _format_row(key: str, r: dict) -> str:
+    return f"{key:<34} p50 {r['p50_ms']:>10.2f} ms  p99 {r['p99_ms']:>10.2f} ms  rss {r['peak_rss_mb']:>8.1f} MB"
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `current` against `baseline`: slower p50 or higher peak RSS beyond `tolerance`."""
+    regressions = []
+    for key, base in baseline["results"].items():
+        now = current["results"].get(key)
+        if now is None:
+            continue
+        if now["p50_ms"] > base["p50_ms"] * (1 + tolerance) and now["p50_ms"] - base["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append(f"{key}: p50 {base['p50_ms']:.2f} -> {now['p50_ms']:.2f} ms ({now['p50_ms'] / base['p50_ms']:.2f}x)")
+        if now["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak RSS {base['peak_rss_mb']:.1f} -> {now['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Benchmark ingest, derived data, API endpoints and Shiny renders.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated set counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None, help="write results (e.g. a new baseline) to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed fractional slowdown / RSS growth")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    results = run([parse_count(s) for s in args.sizes.split(",")], cases, args.iterations, args.seed)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=1) + "\n")
+        print(f"saved {args.save}", file=sys.stderr)
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Startup report: import times and cold-start latency of the API and the Shiny app.
+
+- imports: each entry module (api.main, app) is imported in a fresh
+  interpreter under `python -X importtime`; the report gives the total and
+  the slowest of the modules it imports directly (cumulative, so a package's
+  own imports are inside its figure);
+- cold start: each server is launched as a subprocess (uvicorn, shiny run)
+  and polled until its first successful response, GET /api/health for the
+  API and GET / (the page) for the Shiny app; the median of --runs launches
+  is compared with the targets below.
+
+    python -m bench.startup
+    python -m bench.startup --runs 5 --check   # exits 1 when a median misses its target
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ("api.main", "app")
+# Cold-start targets in seconds: launch to first successful response
+TARGETS = {"api_health": 1.5, "shiny_page": 1.5}
+SERVERS = {
+    "api_health": (["-m", "uvicorn", "api.main:app"], "/api/health"),
+    "shiny_page": (["-m", "shiny", "run", "app.py"], "/"),
+}
+READY_TIMEOUT = 60.0
+TOP_IMPORTS = 8
+
+
+def import_times(module: str) -> dict:
+    """Total import time of `module` and the cumulative time of each module it imports directly, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    children: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip() == "cumulative":  # header
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return {"total_ms": int(cumulative) / 1000, "imports_ms": dict(sorted(children.items(), key=lambda kv: -kv[1]))}
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative) / 1000
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(args: list[str], path: str, timeout: float = READY_TIMEOUT) -> float:
+    """Seconds from launching `python <args> --port N` to the first 2xx response to `path`."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, *args, "--port", str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"{' '.join(args)} exited with {server.returncode} before responding")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    response.read()
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{' '.join(args)} did not respond within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(runs: int) -> dict:
+    results = {"python": sys.version.split()[0], "imports": {}, "cold_start": {}}
+    for module in MODULES:
+        results["imports"][module] = times = import_times(module)
+        print(f"import {module:<10} {times['total_ms']:8.0f} ms")
+        for name, ms in list(times["imports_ms"].items())[:TOP_IMPORTS]:
+            print(f"    {name:<30} {ms:8.0f} ms")
+    for name, (args, path) in SERVERS.items():
+        samples = [time_to_ready(args, path) for _ in range(runs)]
+        median = float(np.median(samples))
+        results["cold_start"][name] = {"runs": runs, "median_s": median, "max_s": max(samples), "target_s": TARGETS[name]}
+        status = "ok" if median <= TARGETS[name] else "MISSED"
+        print(f"{name:<14} median {median:6.2f} s  max {max(samples):6.2f} s  target {TARGETS[name]:.2f} s  {status}")
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="Report import times and cold-start latency.")
+    parser.add_argument("--runs", type=int, default=3, help="server launches per measurement")
+    parser.add_argument("--save", default=None, help="write the report to this JSON file")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a cold-start median misses its target")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("PYTHONPATH", str(ROOT))
+    results = report(args.runs)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=1) + "\n")
+    missed = [name for name, r in results["cold_start"].items() if r["median_s"] > r["target_s"]]
+    if args.check and missed:
+        print(f"missed startup target(s): {', '.join(missed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Chart rendering for the Shiny app.
+
+Building a plotnine chart and rasterising it through matplotlib is the slowest
+step of the app, so finished PNGs are kept in a bounded LRU (as files, which is
+what `render.image` serves) keyed by everything that determines the image
+(dataset hash, analysis, exercise, date range, point budget and plot size). Misses are rendered in a process pool so the session's
+event loop keeps serving other outputs, and concurrent requests for the same
+chart share one render. The plotnine builders live in plots.py, which is
+imported on the first render rather than at app startup.
+"""
+import asyncio
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+PPI = 100  # plotnine's default dpi; sizes are converted from CSS pixels with it
+
+
+def render_png(path: str, analysis: str, data: pd.DataFrame, width: float, height: float, pixelratio: float = 1.0) -> str:
+    """Rasterise one chart to a PNG at `width` x `height` CSS pixels. Runs in the worker processes."""
+    from plots import PLOTS  # plotnine is only imported once a chart is drawn
+
+    PLOTS[analysis](data).save(
+        path, format="png", units="in", width=width / PPI, height=height / PPI, dpi=PPI * pixelratio, verbose=False
+    )
+    return path
+
+
+class RenderCache:
+    """LRU of rendered chart files with single-flight rendering of misses."""
+
+    def __init__(self, max_entries: int = 64, workers: int = 2, directory: str | None = None):
+        self.max_entries = max_entries
+        self.workers = workers
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="lift-metrics-charts-")
+            atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = directory
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._pending: dict[tuple, asyncio.Future] = {}
+        self._executor: Executor | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            # spawn, not fork: the server process has threads running
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _render(self, *args) -> "asyncio.Future[str]":
+        if self.workers <= 0:
+            done: Future = Future()
+            done.set_result(render_png(*args))
+            return asyncio.wrap_future(done)
+        return asyncio.wrap_future(self._pool().submit(render_png, *args))
+
+    async def _fill(self, key: tuple, *args) -> str:
+        path = os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest()[:24] + ".png")
+        try:
+            await self._render(path, *args)
+        except BrokenProcessPool:
+            # A worker died; release the broken pool and start a fresh one for the next render
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            raise
+        finally:
+            del self._pending[key]
+        self._entries[key] = path
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted != path:
+                os.remove(evicted)
+        return path
+
+    async def get(self, key: tuple, analysis: str, data: pd.DataFrame, width: float, height: float, pixelratio: float) -> str:
+        """Path of the chart's PNG, rendered in the pool on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if key not in self._pending:
+            self.misses += 1
+            self._pending[key] = asyncio.ensure_future(self._fill(key, analysis, data, width, height, pixelratio))
+        return await asyncio.shield(self._pending[key])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "rendering": len(self._pending)}
+
+
+def cache_from_env() -> RenderCache:
+    return RenderCache(
+        max_entries=int(os.environ.get("LIFT_METRICS_RENDER_CACHE_ENTRIES", 64)),
+        workers=int(os.environ.get("LIFT_METRICS_RENDER_WORKERS", 2)),
+    )
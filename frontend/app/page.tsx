@@ -1,7 +1,7 @@
 "use client";
 
-import { useCallback, useEffect, useState } from "react";
-import { fetchDefaultData, fetch1RM, fetchVolume, uploadCsv } from "@/lib/api";
+import { useCallback, useEffect, useRef, useState } from "react";
+import { DatasetExpiredError, fetchDefaultData, fetch1RM, fetchVolume, uploadCsv } from "@/lib/api";
 import type { OneRMResponse, UploadResponse, VolumeResponse } from "@/lib/types";
 import { ValueCards } from "@/components/ValueCard";
 import { StatsCards } from "@/components/StatsCards";
@@ -22,6 +22,9 @@ export default function AnalyzePage() {
   const [oneRM, setOneRM] = useState<OneRMResponse | null>(null);
   const [volume, setVolume] = useState<VolumeResponse | null>(null);
   const [analysisLoading, setAnalysisLoading] = useState(false);
+  const [analysisError, setAnalysisError] = useState<string | null>(null);
+  // Set while the default data is re-registered after expiring, so a second expiry isn't retried
+  const reregistered = useRef(false);
 
   const loadDefault = useCallback(async () => {
     setLoading(true);
@@ -48,7 +51,8 @@ export default function AnalyzePage() {
     if (!file) return;
     setUploadError(null);
     try {
-      const res = await uploadCsv(file);
+      // A newer cumulative export of the same log only appends its new workouts server-side
+      const res = await uploadCsv(file, upload?.ingest ? upload.dataset_id : undefined);
       setUpload(res);
       if (res.exercises.length) setExercise(res.exercises[0]);
       if (res.date_range.min) setStartDate(res.date_range.min.slice(0, 10));
@@ -58,34 +62,59 @@ export default function AnalyzePage() {
     } catch (e) {
       setUploadError(e instanceof Error ? e.message : "Upload failed");
     }
-  }, []);
+  }, [upload]);
+
+  // Datasets expire server-side: the default data is registered again (same dataset_id, and the
+  // new upload state re-runs the analyses); an upload has to be picked again.
+  const handleAnalysisError = useCallback(async (e: unknown) => {
+    if (!(e instanceof DatasetExpiredError) || upload?.ingest || reregistered.current) {
+      setAnalysisError(e instanceof Error ? e.message : "Analysis failed");
+      return;
+    }
+    reregistered.current = true;
+    try {
+      setUpload(await fetchDefaultData());
+    } catch (err) {
+      setAnalysisError(err instanceof Error ? err.message : "Failed to load data");
+    }
+  }, [upload]);
+
+  const analysisDone = () => {
+    reregistered.current = false;
+    setAnalysisError(null);
+  };
 
   useEffect(() => {
-    if (!upload?.data.length || !startDate || !endDate) return;
+    if (!upload?.dataset_id || !startDate || !endDate) return;
     if (analysisType === "1") {
       if (!exercise) return;
       setAnalysisLoading(true);
-      fetch1RM(upload.data, exercise, startDate, endDate)
-        .then(setOneRM)
-        .catch(() => setOneRM(null))
+      fetch1RM(upload.dataset_id, exercise, startDate, endDate)
+        .then((res) => {
+          analysisDone();
+          setOneRM(res);
+        })
+        .catch((e) => {
+          setOneRM(null);
+          handleAnalysisError(e);
+        })
         .finally(() => setAnalysisLoading(false));
     } else {
       setAnalysisLoading(true);
-      fetchVolume(upload.data, startDate, endDate)
-        .then(setVolume)
-        .catch(() => setVolume(null))
+      fetchVolume(upload.dataset_id, startDate, endDate)
+        .then((res) => {
+          analysisDone();
+          setVolume(res);
+        })
+        .catch((e) => {
+          setVolume(null);
+          handleAnalysisError(e);
+        })
         .finally(() => setAnalysisLoading(false));
     }
-  }, [upload, analysisType, exercise, startDate, endDate]);
+  }, [upload, analysisType, exercise, startDate, endDate, handleAnalysisError]);
 
-  const selectedExerciseSetsReps = upload?.data
-    ? upload.data
-        .filter((r) => r["Exercise Name"] === exercise)
-        .reduce(
-          (acc, r) => ({ sets: acc.sets + 1, reps: acc.reps + (r.Reps || 0) }),
-          { sets: 0, reps: 0 }
-        )
-    : { sets: 0, reps: 0 };
+  const selectedExerciseSetsReps = upload?.exercise_totals[exercise] ?? { sets: 0, reps: 0 };
 
   if (loading) {
     return (
@@ -180,6 +209,10 @@ export default function AnalyzePage() {
           <ValueCards prs={upload.prs} />
           <hr className="my-8 border-gray-200" />
 
+          {analysisError && (
+            <p className="mb-6 text-center text-sm text-red-600">{analysisError}</p>
+          )}
+
           {analysisType === "1" && (
             <>
               <h2 className="font-heading font-bold text-xl text-center text-gray-800 mb-4">
@@ -196,7 +229,14 @@ export default function AnalyzePage() {
                     <StatsCards stats={oneRM.stats} />
                   </div>
                   <hr className="my-8 border-gray-200" />
-                  <DataTable data={oneRM.table_data} title={`${exercise} Data`} />
+                  <DataTable
+                    datasetId={upload.dataset_id}
+                    exercise={exercise}
+                    startDate={startDate}
+                    endDate={endDate}
+                    title={`${exercise} Data`}
+                    onError={handleAnalysisError}
+                  />
                 </>
               )}
             </>
@@ -1,8 +1,8 @@
 "use client";
 
-import { useMemo, useState } from "react";
-
-type Row = { Date: string; "Set Order": number; Weight: number; Reps: number };
+import { useEffect, useMemo, useState } from "react";
+import { fetchSets } from "@/lib/api";
+import type { SetRow } from "@/lib/types";
 
 type DayRow = {
   dateKey: string;
@@ -27,8 +27,9 @@ function dateToKey(dateStr: string): string {
   return isNaN(d.getTime()) ? dateStr : d.toISOString().slice(0, 10);
 }
 
-function groupByDate(rows: Row[]): DayRow[] {
-  const byDate = new Map<string, Row[]>();
+// Rows arrive in (date, set order) order, reversed when newest first.
+function groupByDate(rows: SetRow[], newestFirst: boolean): DayRow[] {
+  const byDate = new Map<string, SetRow[]>();
   for (const row of rows) {
     const key = dateToKey(row.Date);
     if (!byDate.has(key)) byDate.set(key, []);
@@ -36,7 +37,7 @@ function groupByDate(rows: Row[]): DayRow[] {
   }
   const result: DayRow[] = [];
   for (const [dateKey, dayRows] of byDate) {
-    const sorted = [...dayRows].sort((a, b) => a["Set Order"] - b["Set Order"]);
+    const sorted = newestFirst ? [...dayRows].reverse() : dayRows;
     const sets = sorted.map((r) => `${r.Weight}×${r.Reps}`);
     const totalVolume = sorted.reduce((sum, r) => sum + r.Weight * r.Reps, 0);
     result.push({
@@ -50,28 +51,67 @@ function groupByDate(rows: Row[]): DayRow[] {
   return result;
 }
 
+/** An exercise's sets, loaded from the API a page at a time (newest or oldest first). */
 export function DataTable({
-  data,
+  datasetId,
+  exercise,
+  startDate,
+  endDate,
   title,
+  onError,
 }: {
-  data: Row[];
+  datasetId: string;
+  exercise: string;
+  startDate: string;
+  endDate: string;
   title: string;
+  onError?: (error: unknown) => void;
 }) {
-  if (!data.length) {
-    return (
-      <div className="rounded-xl border border-gray-200/80 bg-white p-8 shadow-sm">
-        <h2 className="font-heading font-bold text-lg text-center text-gray-700 mb-2">
-          {title}
-        </h2>
-        <p className="text-center text-gray-500 text-sm">No rows in this range.</p>
-      </div>
-    );
-  }
-
   const [sort, setSort] = useState<SortOption>("newest");
+  const [rows, setRows] = useState<SetRow[]>([]);
+  const [total, setTotal] = useState(0);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+  // Every sort but "oldest" pages newest first; the volume sorts reorder the days loaded so far.
+  const newestFirst = sort !== "oldest";
+
+  useEffect(() => {
+    let cancelled = false;
+    setLoading(true);
+    fetchSets(datasetId, exercise, startDate, endDate, newestFirst ? "desc" : "asc")
+      .then((page) => {
+        if (cancelled) return;
+        setRows(page.rows);
+        setTotal(page.total);
+        setCursor(page.next_cursor);
+      })
+      .catch((e) => {
+        if (cancelled) return;
+        setRows([]);
+        setTotal(0);
+        setCursor(null);
+        onError?.(e);
+      })
+      .finally(() => !cancelled && setLoading(false));
+    return () => {
+      cancelled = true;
+    };
+  }, [datasetId, exercise, startDate, endDate, newestFirst]);
+
+  const loadMore = () => {
+    if (!cursor) return;
+    setLoading(true);
+    fetchSets(datasetId, exercise, startDate, endDate, newestFirst ? "desc" : "asc", cursor)
+      .then((page) => {
+        setRows((loaded) => [...loaded, ...page.rows]);
+        setCursor(page.next_cursor);
+      })
+      .catch((e) => onError?.(e))
+      .finally(() => setLoading(false));
+  };
 
   const dayRows = useMemo(() => {
-    const grouped = groupByDate(data);
+    const grouped = groupByDate(rows, newestFirst);
     const sorted = [...grouped];
     switch (sort) {
       case "newest":
@@ -88,7 +128,18 @@ export function DataTable({
         break;
     }
     return sorted;
-  }, [data, sort]);
+  }, [rows, sort, newestFirst]);
+
+  if (!rows.length && !loading) {
+    return (
+      <div className="rounded-xl border border-gray-200/80 bg-white p-8 shadow-sm">
+        <h2 className="font-heading font-bold text-lg text-center text-gray-700 mb-2">
+          {title}
+        </h2>
+        <p className="text-center text-gray-500 text-sm">No rows in this range.</p>
+      </div>
+    );
+  }
 
   return (
     <div className="rounded-xl border border-gray-200/80 bg-white overflow-hidden shadow-sm ring-1 ring-black/5">
@@ -159,6 +210,20 @@ export function DataTable({
           </tbody>
         </table>
       </div>
+      <div className="border-t border-gray-200/80 px-5 py-3 flex items-center justify-between text-sm text-gray-500">
+        <span>
+          {rows.length} of {total} sets loaded
+        </span>
+        {cursor && (
+          <button
+            onClick={loadMore}
+            disabled={loading}
+            className="rounded-lg border border-gray-200 bg-white px-3 py-1.5 font-medium text-gray-700 shadow-sm hover:bg-gray-50 disabled:opacity-50"
+          >
+            {loading ? "Loading…" : "Load more"}
+          </button>
+        )}
+      </div>
     </div>
   );
 }
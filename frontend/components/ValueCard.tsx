@@ -14,25 +14,28 @@ const AWARD_SVG = (
   </svg>
 );
 
-const cards: { key: keyof PRs; label: string; gradient: string }[] = [
-  { key: "bench", label: "Bench", gradient: "from-emerald-600 to-emerald-700" },
-  { key: "deadlift", label: "Deadlift", gradient: "from-blue-600 to-blue-800" },
-  { key: "squat", label: "Squat", gradient: "from-red-600 to-red-800" },
+// One card per lift group, in the server's order; colours repeat past the third
+const gradients = [
+  "from-emerald-600 to-emerald-700",
+  "from-blue-600 to-blue-800",
+  "from-red-600 to-red-800",
 ];
 
+const label = (group: string) => group.charAt(0).toUpperCase() + group.slice(1);
+
 export function ValueCards({ prs }: { prs: PRs }) {
   return (
     <div className="grid grid-cols-1 sm:grid-cols-3 gap-4">
-      {cards.map(({ key, label, gradient }) => (
+      {Object.entries(prs).map(([group, weight], i) => (
         <div
-          key={key}
-          className={`rounded-xl bg-gradient-to-br ${gradient} text-white p-5 shadow-lg flex items-center gap-4 min-h-[100px]`}
+          key={group}
+          className={`rounded-xl bg-gradient-to-br ${gradients[i % gradients.length]} text-white p-5 shadow-lg flex items-center gap-4 min-h-[100px]`}
         >
           <div className="shrink-0">{AWARD_SVG}</div>
           <div>
-            <p className="font-heading font-semibold text-white/90">{label}</p>
+            <p className="font-heading font-semibold text-white/90">{label(group)}</p>
             <p className="text-2xl font-bold">
-              {prs[key] > 0 ? `${prs[key].toFixed(2)} lbs` : "—"}
+              {weight > 0 ? `${weight.toFixed(2)} lbs` : "—"}
             </p>
           </div>
         </div>
@@ -1,4 +1,17 @@
 const API_BASE = (process.env.NEXT_PUBLIC_LIFT_METRICS_BACKEND_API || "http://localhost:8000").replace(/\/$/, "");
+// Chart series longer than this are downsampled server-side (PR days are kept).
+const MAX_CHART_POINTS = 500;
+// The set table loads this many sets at a time.
+const SETS_PAGE_SIZE = 200;
+
+/** The dataset is no longer stored server-side (evicted or expired); it has to be registered again. */
+export class DatasetExpiredError extends Error {}
+
+async function analysisFailure(res: Response, message: string): Promise<Error> {
+  const err = await res.json().catch(() => ({}));
+  if (res.status === 404) return new DatasetExpiredError(err.detail || "Dataset not found or expired; upload it again");
+  return new Error(err.detail || message);
+}
 
 export async function fetchDefaultData(): Promise<import("./types").UploadResponse> {
   const res = await fetch(`${API_BASE}/api/default-data`);
@@ -6,9 +19,13 @@ export async function fetchDefaultData(): Promise<import("./types").UploadRespon
   return res.json();
 }
 
-export async function uploadCsv(file: File): Promise<import("./types").UploadResponse> {
+export async function uploadCsv(
+  file: File,
+  baseDatasetId?: string
+): Promise<import("./types").UploadResponse> {
   const form = new FormData();
   form.append("file", file);
+  if (baseDatasetId) form.append("base_dataset_id", baseDatasetId);
   const res = await fetch(`${API_BASE}/api/upload`, { method: "POST", body: form });
   if (!res.ok) {
     const err = await res.json().catch(() => ({}));
@@ -18,39 +35,66 @@ export async function uploadCsv(file: File): Promise<import("./types").UploadRes
 }
 
 export async function fetch1RM(
-  data: import("./types").WorkoutRow[],
+  datasetId: string,
   exercise: string,
   startDate: string,
-  endDate: string
+  endDate: string,
+  maxPoints: number = MAX_CHART_POINTS
 ): Promise<import("./types").OneRMResponse> {
   const res = await fetch(`${API_BASE}/api/analysis/1rm`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
-      data,
+      dataset_id: datasetId,
       exercise,
       start_date: startDate,
       end_date: endDate,
+      max_points: maxPoints,
     }),
   });
-  if (!res.ok) throw new Error("1RM analysis failed");
+  if (!res.ok) throw await analysisFailure(res, "1RM analysis failed");
+  return res.json();
+}
+
+export async function fetchSets(
+  datasetId: string,
+  exercise: string,
+  startDate: string,
+  endDate: string,
+  order: "asc" | "desc",
+  cursor?: string | null,
+  limit: number = SETS_PAGE_SIZE
+): Promise<import("./types").SetsPage> {
+  const params = new URLSearchParams({
+    dataset_id: datasetId,
+    exercise,
+    start_date: startDate,
+    end_date: endDate,
+    order,
+    limit: String(limit),
+  });
+  if (cursor) params.set("cursor", cursor);
+  const res = await fetch(`${API_BASE}/api/sets?${params}`);
+  if (!res.ok) throw await analysisFailure(res, "Loading sets failed");
   return res.json();
 }
 
 export async function fetchVolume(
-  data: import("./types").WorkoutRow[],
+  datasetId: string,
   startDate: string,
-  endDate: string
+  endDate: string,
+  maxPoints: number = MAX_CHART_POINTS
 ): Promise<import("./types").VolumeResponse> {
   const res = await fetch(`${API_BASE}/api/analysis/volume`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
-      data,
+      dataset_id: datasetId,
       start_date: startDate,
       end_date: endDate,
+      max_points: maxPoints,
     }),
   });
-  if (!res.ok) throw new Error("Volume analysis failed");
+  if (!res.ok) throw await analysisFailure(res, "Volume analysis failed");
   return res.json();
 }
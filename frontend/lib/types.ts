@@ -8,19 +8,40 @@ export type WorkoutRow = {
 
 export type DateRange = { min: string | null; max: string | null };
 
-export type PRs = { bench: number; deadlift: number; squat: number };
+/** All-time heaviest set per lift group; groups come from the server's configuration. */
+export type PRs = Record<string, number>;
+
+export type ExerciseTotals = Record<string, { sets: number; reps: number }>;
+
+export type IngestSummary = {
+  mode: "full" | "append" | "cached";
+  added: number;
+  duplicates: number;
+  conflicts: number;
+};
 
 export type UploadResponse = {
+  dataset_id: string;
   exercises: string[];
-  data: WorkoutRow[];
+  exercise_totals: ExerciseTotals;
   date_range: DateRange;
   prs: PRs;
+  ingest?: IngestSummary;
 };
 
 export type OneRMResponse = {
   daily_max: { date: string; one_rep_max: number }[];
   stats: { best_pr: number; average_volume: number; total_volume: number };
-  table_data: { Date: string; "Set Order": number; Weight: number; Reps: number }[];
+};
+
+export type SetRow = { Date: string; "Set Order": string; Weight: number; Reps: number };
+
+export type SetsPage = {
+  dataset_id: string;
+  exercise: string;
+  total: number;
+  rows: SetRow[];
+  next_cursor: string | null;
 };
 
 export type VolumeResponse = {
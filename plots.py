@@ -0,0 +1,54 @@
+"""
+plotnine chart builders for the Shiny app's analyses.
+
+Importing plotnine (and matplotlib behind it) takes a noticeable part of a
+second, so only charts.render_png imports this module, on the first render,
+in the render worker or the server process.
+"""
+import pandas as pd
+from plotnine import ggplot, aes, facet_wrap, geom_hline, geom_line, geom_point, scale_x_datetime, theme, element_text, labs
+
+
+def one_rep_max_plot(daily_max: pd.DataFrame) -> ggplot:
+    return (ggplot(daily_max, aes(x='Date', y='1_Rep_Max'))
+        + geom_line()
+        + geom_point(aes(size='1_Rep_Max'), alpha=0.6)
+        + scale_x_datetime(date_breaks='1 month', date_labels='%b %Y')
+        + theme(axis_text_x=element_text(angle=45))
+        + labs(x='Date', y='1 Rep Max')
+        )
+
+
+def volume_plot(daily_volume: pd.DataFrame) -> ggplot:
+    return (ggplot(daily_volume, aes(x='Date', y='Volume'))
+        + geom_line()
+        + geom_line(aes(y='Average_Volume'), color='teal', linetype='dashed')
+        + geom_point(aes(size='Volume', color='Color'), alpha=0.6)
+        + scale_x_datetime(date_breaks='1 month', date_labels='%b %Y')
+        + theme(axis_text_x=element_text(angle=45))
+        + labs(x='Date', y='Volume')
+        )
+
+
+LOAD_PANELS = {
+    "Acute (7d)": "Load", "Chronic (28d)": "Load",
+    "Fitness": "Fitness / Fatigue", "Fatigue": "Fitness / Fatigue",
+    "ACWR": "Acute:Chronic Ratio",
+}
+
+
+def training_load_plot(load: pd.DataFrame) -> ggplot:
+    long = load.melt(id_vars='Date', value_vars=list(LOAD_PANELS), var_name='Series', value_name='Value').dropna()
+    long['Panel'] = pd.Categorical(long['Series'].map(LOAD_PANELS), categories=list(dict.fromkeys(LOAD_PANELS.values())))
+    return (ggplot(long, aes(x='Date', y='Value', color='Series'))
+        + geom_line()
+        + geom_hline(pd.DataFrame({'Panel': pd.Categorical(['Acute:Chronic Ratio'] * 2, categories=long['Panel'].cat.categories), 'y': [0.8, 1.3]}),
+                     aes(yintercept='y'), linetype='dashed', color='grey')
+        + facet_wrap('Panel', ncol=1, scales='free_y')
+        + scale_x_datetime(date_breaks='1 month', date_labels='%b %Y')
+        + theme(axis_text_x=element_text(angle=45))
+        + labs(x='Date', y='')
+        )
+
+
+PLOTS = {"1": one_rep_max_plot, "2": volume_plot, "3": training_load_plot}
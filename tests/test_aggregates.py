@@ -0,0 +1,16 @@
+import pandas as pd
+
+from api.store import WorkoutStore
+
+
+def test_best_pr_without_weights_is_zero():
+    store = WorkoutStore(pd.DataFrame({
+        "Date": pd.to_datetime(["2024-06-01 10:00", "2024-06-02 10:00", "2024-06-02 11:00"]),
+        "Exercise Name": ["Running", "Running", "Squat"],
+        "Set Order": [1, 1, 1],
+        "Weight": [float("nan"), float("nan"), 100.0],
+        "Reps": [float("nan"), float("nan"), 5.0],
+    }))
+    assert store.aggregates.exercise_stats("Running")["best_pr"] == 0.0
+    assert store.aggregates.exercise_stats("Squat")["best_pr"] == 100.0
+    assert store.aggregates.prs().to_dict() == {"Running": 0.0, "Squat": 100.0}
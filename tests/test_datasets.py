@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from api.datasets import DatasetStore, DatasetStoreFull
+from api.store import WorkoutStore
+
+
+def make_store(sets: int = 10) -> WorkoutStore:
+    return WorkoutStore(pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=sets, freq="D"),
+        "Exercise Name": "Squat",
+        "Set Order": 1,
+        "Weight": 100.0,
+        "Reps": 5.0,
+    }))
+
+
+def test_released_dataset_stays_cached():
+    datasets, builds = DatasetStore(), []
+    build = lambda: builds.append(1) or make_store()
+    datasets.acquire("a", build)
+    datasets.release("a")
+    assert datasets.get("a") is not None
+    datasets.acquire("a", build)
+    assert len(builds) == 1
+
+
+def test_only_unreferenced_datasets_are_evicted():
+    datasets = DatasetStore(max_entries=2)
+    datasets.acquire("a", make_store)
+    datasets.acquire("b", make_store)
+    datasets.release("b")
+    datasets.acquire("c", make_store)
+    assert datasets.get("a") is not None and datasets.get("b") is None and datasets.get("c") is not None
+
+
+def test_acquire_beyond_cap_is_refused():
+    size = make_store().nbytes
+    datasets = DatasetStore(max_bytes=int(size * 1.5))
+    datasets.acquire("a", make_store)
+    with pytest.raises(DatasetStoreFull):
+        datasets.acquire("b", make_store)
+    datasets.release("a")
+    datasets.acquire("b", make_store)
+    assert datasets.get("a") is None
+
+
+def test_concurrent_first_acquires_build_once():
+    datasets, builds = DatasetStore(), []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return make_store()
+
+    threads = [threading.Thread(target=datasets.acquire, args=("a", build)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert datasets.stats()["referenced"] == 1 and datasets.get("a").refs == 4
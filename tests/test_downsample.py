@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.downsample import MIN_POINTS, downsample
+
+
+def _series(y) -> pd.DataFrame:
+    return pd.DataFrame({"date": pd.date_range("2020-01-01", periods=len(y)), "y": y})
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_smallest_budget_downsamples_with_both_methods(method):
+    df = _series(np.sin(np.arange(1000) / 20.0))
+    out = downsample(df, "date", "y", MIN_POINTS, method)
+    assert len(out) < 10
+    with pytest.raises(ValueError):
+        downsample(df, "date", "y", MIN_POINTS - 1, method)
+
+
+def test_records_fill_up_to_a_quarter_of_the_budget():
+    # Every day is a record; only the latest quarter of the budget are kept as records.
+    df = _series(np.arange(1000.0))
+    out = downsample(df, "date", "y", 100)
+    assert df.index[-25:].isin(out.index).all()
+    assert len(out) <= 100
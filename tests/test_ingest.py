@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.ingest import ingest_export
+
+EXPORT = Path(__file__).parent.parent / "data" / "strong.csv"
+
+
+@pytest.fixture(scope="module")
+def lines() -> list[bytes]:
+    return EXPORT.read_bytes().splitlines(keepends=True)
+
+
+@pytest.fixture(scope="module")
+def cut(lines) -> int:
+    """Line index where the last ~200 rows start, at a workout boundary (rows of a workout share its Date)."""
+    cut = len(lines) - 200
+    while lines[cut][:19] == lines[cut - 1][:19]:
+        cut += 1
+    return cut
+
+
+@pytest.fixture
+def base(lines, cut):
+    store = ingest_export(b"".join(lines[:cut])).store
+    store.aggregates, store.lifts  # built, so append extends them
+    return store
+
+
+def assert_same_store(store, expected):
+    pd.testing.assert_frame_equal(store.frame, expected.frame)
+    np.testing.assert_array_equal(store.by_date, expected.by_date)
+    np.testing.assert_array_equal(store.offsets, expected.offsets)
+    pd.testing.assert_frame_equal(store.aggregates.exercise_daily, expected.aggregates.exercise_daily, check_dtype=False)
+    pd.testing.assert_frame_equal(store.aggregates.daily_volume, expected.aggregates.daily_volume, check_dtype=False)
+    assert store.lifts.max_weights() == expected.lifts.max_weights()
+    assert store.source == expected.source
+
+
+def test_append_matches_full_parse(lines, cut, base):
+    export = b"".join(lines)
+    result = ingest_export(export, base)
+    assert result.summary() == {"mode": "append", "added": len(lines) - cut, "duplicates": cut - 1, "conflicts": 0}
+    assert_same_store(result.store, ingest_export(export).store)
+
+
+def test_append_after_unterminated_last_line(lines):
+    export = b"".join(lines)
+    assert not export.endswith(b"\n")  # as Strong writes it
+    base = ingest_export(export).store
+    extended = export + b'\n2099-01-01 10:00:00,"Day",1h,"Aardvark Row",1,100.0,5.0,0,0.0,\n'
+    result = ingest_export(extended, base)
+    assert result.summary() == {"mode": "append", "added": 1, "duplicates": len(lines) - 1, "conflicts": 0}
+    assert "Aardvark Row" in result.store.exercises  # new exercise, categories extended
+    assert_same_store(result.store, ingest_export(extended).store)
+
+
+def test_continued_last_line_falls_back_to_full_parse(lines):
+    export = b"".join(lines)
+    base = ingest_export(export).store
+    result = ingest_export(export + b"8", base)  # the last set gains an RPE
+    assert result.mode == "full"
+    assert result.store.frame["RPE"].notna().sum() == 1
+
+
+def test_same_export_appends_nothing(lines, cut, base):
+    result = ingest_export(b"".join(lines[:cut]), base)
+    assert result.summary() == {"mode": "append", "added": 0, "duplicates": cut - 1, "conflicts": 0}
+    assert len(result.store) == len(base)
+
+
+def test_extra_old_set_falls_back_to_full_parse(lines, cut, base):
+    export = b"".join(lines[:6] + [lines[5]] + lines[6:])
+    result = ingest_export(export, base)
+    assert result.summary() == {"mode": "full", "added": len(lines) - cut + 1, "duplicates": cut - 1, "conflicts": 0}
+    assert_same_store(result.store, ingest_export(export).store)
+
+
+def test_edited_set_falls_back_to_full_parse(lines, cut, base):
+    fields = lines[5].decode().split(",")
+    fields[5] = str(float(fields[5]) + 2.5)  # Weight
+    export = b"".join(lines[:5] + [",".join(fields).encode()] + lines[6:])
+    result = ingest_export(export, base)
+    assert result.summary() == {"mode": "full", "added": len(lines) - cut, "duplicates": cut - 2, "conflicts": 1}
+    assert_same_store(result.store, ingest_export(export).store)
+
+
+def test_tail_within_last_workout_falls_back_to_full_parse(lines, cut):
+    base = ingest_export(b"".join(lines[:cut - 1])).store  # stops one set short of a workout's end
+    result = ingest_export(b"".join(lines), base)
+    # The missing set of the base's last workout is new, not a conflict
+    assert result.summary() == {"mode": "full", "added": len(lines) - cut + 1, "duplicates": cut - 2, "conflicts": 0}
+
+
+def test_base_without_mark_is_classified(lines, cut, base):
+    base.source = None
+    result = ingest_export(b"".join(lines), base)
+    assert result.summary() == {"mode": "full", "added": len(lines) - cut, "duplicates": cut - 1, "conflicts": 0}
+
+
+def test_disk_cache_keeps_mark(lines, cut, tmp_path):
+    disk_cache = pytest.importorskip("api.disk_cache")
+    if disk_cache.pa is None:
+        pytest.skip("pyarrow is not installed")
+    cache = disk_cache.DiskCache(tmp_path)
+    base = cache.load_or_ingest("base", b"".join(lines[:cut])).store
+    assert cache.load("base").source == base.source
+    result = cache.load_or_ingest("full", b"".join(lines), cache.load("base"))
+    assert result.mode == "append"
@@ -0,0 +1,14 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("body", [
+    {"dataset_id": "any", "exercises": ["Squat"], "formulas": []},
+    {"dataset_id": "any", "exercises": []},
+])
+def test_batch_needs_an_exercise_and_a_formula(body):
+    assert client.post("/api/analysis/1rm/batch", json=body).status_code == 422